@@ -0,0 +1,98 @@
+"""
+Embedded page JSON: utils.embedded against the code it replaced
+
+The fixtures are trimmed ITV, STV, Channel 4 and iPlayer show pages. Real
+pages carry far more card markup, so the block between the cards comments is
+repeated to bring them back to a few hundred KB. The body is fed to extract()
+in 64 KB chunks, as httpx streams it
+
+python -m benchmarks.embedded [repeat]
+"""
+
+import json
+import re
+import sys
+import timeit
+
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from utils.embedded import NEXT_DATA, PARAMS, REDUX, extract, loads
+
+FIXTURES = Path(__file__).parent / "fixtures"
+CARDS = re.compile(r"<!-- cards -->.*<!-- /cards -->", re.DOTALL)
+CHUNK = 65536
+RUNS = 5
+
+
+def next_data(page: bytes) -> dict:
+    soup = BeautifulSoup(page, "html.parser")
+    return json.loads(soup.select_one("#__NEXT_DATA__").text)
+
+
+def params(page: bytes) -> dict:
+    init_data = re.search(
+        r"<script>window\.__PARAMS__ = (.*)</script>",
+        page.decode()
+        .replace("\u200c", "")
+        .replace("\r\n", "")
+        .replace("undefined", "null"),
+    )
+    return json.loads(init_data.group(1))
+
+
+def redux(page: bytes) -> dict:
+    html = page.decode()
+    return json.loads(
+        re.search("window.__IPLAYER_REDUX_STATE__ = (.*?);</script>", html).group(1)
+    )
+
+
+CASES = (
+    ("itv", "BeautifulSoup", next_data, NEXT_DATA, False),
+    ("stv", "BeautifulSoup", next_data, NEXT_DATA, False),
+    ("channel4", "replace+regex", params, PARAMS, True),
+    ("bbc", "regex", redux, REDUX, False),
+)
+
+
+def load(name: str, repeat: int) -> bytes:
+    page = (FIXTURES / f"{name}.html").read_text(encoding="utf-8")
+    cards = CARDS.search(page).group()
+    return page.replace(cards, cards * repeat).encode()
+
+
+def streamed(page: bytes, marker: bytes, js: bool) -> tuple:
+    read = 0
+
+    def chunks():
+        nonlocal read
+        for i in range(0, len(page), CHUNK):
+            read = i + CHUNK
+            yield page[i : i + CHUNK]
+
+    return loads(extract(chunks(), marker), js=js), min(read, len(page))
+
+
+def best(function) -> float:
+    return min(timeit.repeat(function, number=1, repeat=RUNS)) * 1000
+
+
+def main(repeat: int = 20) -> None:
+    print(f"best of {RUNS}, ms; card markup repeated {repeat}x")
+    for name, old_name, old, marker, js in CASES:
+        page = load(name, repeat)
+        data, read = streamed(page, marker, js)
+        assert data == old(page), name
+
+        before = best(lambda: old(page))
+        after = best(lambda: streamed(page, marker, js))
+        print(
+            f"{name:9} {len(page) // 1024:4} KB  {old_name:14} {before:7.1f}"
+            f"  extract {after:6.1f}  (read {read // 1024} KB)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
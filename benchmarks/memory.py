@@ -0,0 +1,120 @@
+"""
+Per-episode memory footprint
+
+A catalog is decoded from JSON and turned into episodes, then the decoded
+response is dropped and tracemalloc reports what the episodes still hold.
+The original Episode is a plain class with a __dict__; the current one is
+slotted, interns service and title, and can take its description as a
+loader that runs on first access instead of holding the text. One loader is
+shared by the whole catalog
+
+python -m benchmarks.memory
+"""
+
+import gc
+import json
+import re
+import tracemalloc
+
+from utils.titles import Episode
+
+EPISODES = 20000
+
+
+class OriginalEpisode:
+    def __init__(
+        self,
+        id_=None,
+        service=None,
+        title=None,
+        season=None,
+        number=None,
+        name=None,
+        year=None,
+        data=None,
+        subtitle=None,
+        lic_url=None,
+        synopsis=None,
+        description=None,
+        special=None,
+    ) -> None:
+        if name is not None:
+            name = name.strip()
+            if name.lower() == title.lower():
+                name = ""
+            if re.match(r"Episode ?#?\d+", name, re.IGNORECASE):
+                name = ""
+
+        self.id = id_
+        self.service = service
+        self.title = title
+        self.season = season
+        self.number = number
+        self.name = name
+        self.year = year
+        self.data = data
+        self.subtitle = subtitle
+        self.lic_url = lic_url
+        self.synopsis = synopsis
+        self.description = description
+        self.special = special
+
+
+def catalog() -> bytes:
+    return json.dumps(
+        [
+            {
+                "id": f"p{i:07}",
+                "service": "ALL4",
+                "title": "Benchmark Show",
+                "season": i // 20 + 1,
+                "number": i % 20 + 1,
+                "name": f"Episode title number {i}",
+                "asset": f"{i:08}-001",
+                "summary": f"Episode {i}: " + "a fairly typical one line synopsis " * 4,
+            }
+            for i in range(EPISODES)
+        ]
+    ).encode()
+
+
+def summary(episode) -> str:
+    """Stand-in for fetching one description when it's asked for"""
+    return f"{episode.id}: summary loaded on demand"
+
+
+def footprint(cls, raw: bytes, lazy: bool = False) -> float:
+    gc.collect()
+    tracemalloc.start()
+    records = json.loads(raw)
+    episodes = [
+        cls(
+            id_=x["id"],
+            service=x["service"],
+            title=x["title"],
+            season=x["season"],
+            number=x["number"],
+            name=x["name"],
+            data=x["asset"],
+            description=summary if lazy else x["summary"],
+        )
+        for x in records
+    ]
+    del records
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(episodes) == EPISODES
+    return current / EPISODES
+
+
+def main() -> None:
+    raw = catalog()
+    print(f"{EPISODES} episodes, bytes per episode")
+    print(f"original               {footprint(OriginalEpisode, raw):6.0f}")
+    print(f"slotted                {footprint(Episode, raw):6.0f}")
+    print(f"slotted, lazy summary  {footprint(Episode, raw, lazy=True):6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Building and filtering a 5,000-episode Series
+
+Compares utils.titles and utils.args against the original Episode, which
+formatted its label on every str() and matched an uncompiled regex per name,
+and the original selectors, which lowercased str(episode) for every episode
+and selector
+
+python -m benchmarks.titles
+"""
+
+import re
+import timeit
+
+from types import SimpleNamespace
+
+from sortedcontainers import SortedKeyList
+
+from utils.args import Options
+from utils.titles import Episode, Series
+
+SEASONS = 50
+EPISODES = 100
+RUNS = 20
+
+
+class OriginalEpisode:
+    def __init__(self, title=None, season=None, number=None, name=None) -> None:
+        if name is not None:
+            name = name.strip()
+            if name.lower() == title.lower():
+                name = ""
+            if re.match(r"Episode ?#?\d+", name, re.IGNORECASE):
+                name = ""
+
+        self.title = title
+        self.season = season
+        self.number = number
+        self.name = name
+
+    def __str__(self) -> str:
+        return "{title} S{season:02}E{number:02} {name}".format(
+            title=self.title,
+            season=self.season,
+            number=self.number,
+            name=self.name or "",
+        ).strip()
+
+
+def records() -> list:
+    return [
+        ("Benchmark Show", season, number, f"Name {number}" if number % 3 else "")
+        for season in range(1, SEASONS + 1)
+        for number in range(1, EPISODES + 1)
+    ]
+
+
+def build(data: list) -> Series:
+    return Series(
+        Episode(title=title, season=season, number=number, name=name)
+        for title, season, number, name in data
+    )
+
+
+def original_filter(series: list, selectors: list) -> list:
+    """get_episode_range/get_episode_mix before they used Series lookups"""
+    mix = [x for x in selectors if "-" not in x]
+    ranges = [
+        f"S{season:02d}E{number:02d}"
+        for selector in selectors
+        if "-" in selector
+        for season in range(int(selector[1:3]), int(selector[8:10]) + 1)
+        for number in range(int(selector[4:6]), int(selector[11:13]) + 1)
+    ]
+    return [
+        episode
+        for episode in series
+        if any(i.lower() in str(episode).lower() for i in mix + ranges)
+    ]
+
+
+def current_filter(series: Series, selectors: list) -> list:
+    series._changed()  # count building the search keys, as a real run would
+    options = Options(
+        SimpleNamespace(
+            episode=None, season=None, titles=False, url=None, tmp=None, output=None
+        )
+    )
+    found = []
+    for selector in selectors:
+        if "-" in selector:
+            found.extend(options.get_episode_range(series, selector))
+        else:
+            found.extend(options.get_episode_mix(series, selector))
+    return found
+
+
+def main() -> None:
+    data = records()
+    selectors = ["S10E05", "S03E01-S03E20", "name 49", "S49E99"]
+
+    build_original = timeit.timeit(
+        lambda: SortedKeyList(
+            (OriginalEpisode(*x) for x in data), key=lambda x: (x.season, x.number)
+        ),
+        number=RUNS,
+    )
+    build_current = timeit.timeit(lambda: build(data), number=RUNS)
+
+    original = [OriginalEpisode(*x) for x in data]
+    filter_original = timeit.timeit(
+        lambda: original_filter(original, selectors), number=RUNS
+    )
+
+    current = build(data)
+    filter_current = timeit.timeit(
+        lambda: current_filter(current, selectors), number=RUNS
+    )
+
+    print(f"{len(data)} episodes, {RUNS} runs, ms per run")
+    for name, original, current in (
+        ("build", build_original, build_current),
+        ("filter", filter_original, filter_current),
+    ):
+        print(
+            f"{name:7} original {original / RUNS * 1000:7.1f}"
+            f"  current {current / RUNS * 1000:7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
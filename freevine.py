@@ -1,19 +1,20 @@
-import shutil
-
-from pathlib import Path
+import sys
 
 import click
 import yaml
 
-from utils import __version__
+from utils import __version__, cache, license, ratelimit, retry, workspace
 from utils.documentation import main_help
 from utils.services import get_service
-from utils.utilities import info
+from utils.subtitles.fetch import cancel_pending
+from utils.utilities import info, log_to_stderr
 from utils.search.search import search_engine
+from utils.output import FORMATS
 
 
 @click.command(help=main_help)
 @click.option("--search", nargs=2, type=str, help="Search service(s) for titles")
+@click.option("--limit", type=int, help="Max number of search results per service")
 @click.argument("url", type=str, required=False)
 @click.option("-q", "--quality", type=str, help="Specify resolution")
 @click.option("-a", "--all-audio", is_flag=True, help="Include all audio tracks")
@@ -25,21 +26,35 @@ from utils.search.search import search_engine
 @click.option("-i", "--info", is_flag=True, default=False, help="Print title info")
 @click.option("-r", "--remote", is_flag=True, default=False, help="Use remote CDM")
 @click.option("--subtitles", is_flag=True, default=False, help="Download only subtitles")
-def main(search=None, **kwargs) -> None:
-    click.echo("")
+@click.option("-o", "--output", type=click.Choice(FORMATS), help="Machine-readable output")
+def main(search=None, limit=None, **kwargs) -> None:
+    if kwargs.get("output"):
+        log_to_stderr()
+
+    click.echo("", err=bool(kwargs.get("output")))
     info(f"Freevine {__version__}\n")
 
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    ratelimit.configure(config.get("rate_limit"))
+    retry.configure(config.get("retries"))
+    cache.configure(config.get("cache_dir"))
+
     if search:
         alias, keywords = search
-        search_engine(alias, keywords)
-    else:
-        with open("config.yaml", "r") as f:
-            config = yaml.safe_load(f)
+        search_engine(alias, keywords, limit, kwargs.get("output"))
+        return
 
-        Service = get_service(kwargs.get("url"))
+    Service = get_service(kwargs.get("url"))
+    try:
         Service(config, **kwargs)
-
-    shutil.rmtree("tmp") if Path("tmp").exists() else None
+    except retry.BatchError:
+        sys.exit(1)
+    finally:
+        license.report()
+        cancel_pending()
+        workspace.cleanup()
 
 
 if __name__ == "__main__":
@@ -6,9 +6,9 @@ Quality: up to 1080p
 
 """
 
-import subprocess
 import re
-import base64
+import threading
+import time
 
 from urllib.parse import urlparse
 from pathlib import Path
@@ -25,13 +25,16 @@ from utils.utilities import (
     print_info,
     set_save_path,
     set_filename,
-    add_subtitles,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import local_cdm
+from utils.license import Codec
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
-
+from utils.retry import download_all, prefetch, run_downloader
+from utils.pssh import build_pssh
+from utils.subtitles.fetch import Subtitle
+from utils.cache import TTLCache, token_expiry
 
 class ABC(Config):
     def __init__(self, config, **kwargs):
@@ -51,23 +54,33 @@ class ABC(Config):
         self.config.update(self.cfg)
 
         self.lic_url = self.config["license"]
+        self.cache = TTLCache("abciview")
+        self.token_lock = threading.Lock()
         self.get_options()
 
-    def get_token(self):
-        return self.client.post(
-            self.config["jwt"],
-            data={"clientId": self.config["client"]},
-        ).json()["token"]
+    def get_token(self, stale: str = None) -> str:
+        """JWT for the DRM endpoint, reused until a minute before it expires"""
+        with self.token_lock:
+            token = self.cache.get("jwt")
+            if token is None or token == stale:
+                token = self.client.post(
+                    self.config["jwt"],
+                    data={"clientId": self.config["client"]},
+                ).json()["token"]
+                expires = token_expiry(token, default=time.time() + 600) - 60
+                self.cache.set("jwt", token, expires=expires)
+            return token
 
     def get_license(self, video_id: str):
         jwt = self.get_token()
+        url = self.config["drm"].format(video_id=video_id)
 
-        resp = self.client.get(
-            self.config["drm"].format(video_id=video_id),
-            headers={"bearer": jwt},
-        ).json()
+        resp = self.client.get(url, headers={"bearer": jwt}).json()
+        if not resp.get("status") == "ok":
+            jwt = self.get_token(stale=jwt)
+            resp = self.client.get(url, headers={"bearer": jwt}).json()
 
-        if not resp["status"] == "ok":
+        if not resp.get("status") == "ok":
             raise ValueError("Failed to fetch license token")
 
         return resp["license"]
@@ -134,21 +147,13 @@ class ABC(Config):
 
     def get_pssh(self, soup: str) -> str:
         try:
-            kid = (
-                soup.select_one("ContentProtection")
-                .attrs.get("cenc:default_KID")
-                .replace("-", "")
-            )
+            kid = soup.select_one("ContentProtection").attrs.get("cenc:default_KID")
         except:
             raise AttributeError("Video unavailable outside of Australia")
 
-        array_of_bytes = bytearray(b"\x00\x00\x002pssh\x00\x00\x00\x00")
-        array_of_bytes.extend(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        array_of_bytes.extend(b"\x00\x00\x00\x12\x12\x10")
-        array_of_bytes.extend(bytes.fromhex(kid.replace("-", "")))
-        return base64.b64encode(bytes.fromhex(array_of_bytes.hex())).decode("utf-8")
+        return build_pssh(kid)
 
-    def get_mediainfo(self, manifest: str, quality: str, subtitle: str) -> str:
+    def get_mediainfo(self, manifest: str, quality: str) -> str:
         self.soup = BeautifulSoup(self.client.get(manifest), "xml")
         pssh = self.get_pssh(self.soup)
         elements = self.soup.find_all("Representation")
@@ -163,6 +168,9 @@ class ABC(Config):
         for base in base_urls:
             base.string = _base + base.string
 
+        with open(self.tmp / "manifest.mpd", "w") as f:
+            f.write(str(self.soup.prettify()))
+
         if quality is not None:
             if int(quality) in heights:
                 return quality, pssh
@@ -171,12 +179,6 @@ class ABC(Config):
                 info(f"Resolution not available. Getting closest match:")
                 return closest_match, pssh
 
-        if subtitle is not None:
-            self.soup = add_subtitles(self.soup, subtitle)
-
-        with open(self.tmp / "manifest.mpd", "w") as f:
-            f.write(str(self.soup.prettify()))
-
         return heights[0], pssh
 
     def get_playlist(self, video_id: str) -> tuple:
@@ -264,18 +266,20 @@ class ABC(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        licence = lambda stream: self.get_license(stream.id)
+        with prefetch(downloads, licence, workers=2, ahead=1) as self.licences:
+            download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             manifest, subtitle = self.get_playlist(stream.id)
-            res, pssh = self.get_mediainfo(manifest, self.quality, subtitle)
-            customdata = self.get_license(stream.id)
-            self.client.headers.update({"customdata": customdata})
+            subtitle = Subtitle(self.client, subtitle, self.tmp) if subtitle else None
+            res, pssh = self.get_mediainfo(manifest, self.quality)
+            customdata = self.licences[stream].result()
 
         with self.console.status("Getting decryption keys..."):
-            keys = local_cdm(pssh, self.lic_url, self.client)
+            codec = Codec(headers={"customdata": customdata})
+            keys = local_cdm(pssh, self.lic_url, self.client, codec=codec)
 
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
@@ -287,7 +291,7 @@ class ABC(Config):
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = self.tmp / "manifest.mpd"
         self.key_file = self.tmp / "keys.txt"
-        self.sub_path = None
+        self.sub_path = subtitle.result(self) if subtitle else None
 
         info(f"{str(stream)}")
         info(f"{keys[0]}")
@@ -296,10 +300,7 @@ class ABC(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
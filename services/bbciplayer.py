@@ -7,16 +7,13 @@ up to 1080p
 
 """
 
-import subprocess
 import re
-import json
 
 from pathlib import Path
 from collections import Counter
 from urllib.parse import urlparse, urlunparse
 
 import click
-import requests
 import yaml
 
 from bs4 import BeautifulSoup
@@ -32,6 +29,10 @@ from utils.utilities import (
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.embedded import embedded_json, REDUX
+from utils.retry import download_all, prefetch, RequestError, run_downloader
+from utils.subtitles.fetch import Subtitle
+from utils.cache import TTLCache
 
 
 class BBC(Config):
@@ -43,6 +44,7 @@ class BBC(Config):
             self.cfg = yaml.safe_load(f)
 
         self.config.update(self.cfg)
+        self.media = TTLCache("bbciplayer", ttl=1800)
         self.get_options()
 
     def get_data(self, pid: str, slice_id: str) -> dict:
@@ -149,12 +151,21 @@ class BBC(Config):
 
         return soup
 
+    def get_media(self, vpid: str) -> dict:
+        """Media selector response for a version, kept for half an hour across runs"""
+        media = self.media.get(vpid)
+        if media is None:
+            media = self.client.get(self.config["media"].format(vpid=vpid)).json()
+            if "media" in media:
+                self.media.set(vpid, media)
+        return media
+
     def get_playlist(self, pid: str) -> tuple:
         resp = self.client.get(self.config["playlist"].format(pid=pid)).json()
 
         vpid = resp["defaultAvailableVersion"]["smpConfig"]["items"][0]["vpid"]
 
-        media = self.client.get(self.config["media"].format(vpid=vpid)).json()
+        media = self.get_media(vpid)
 
         captions = None
         subtitle = None
@@ -164,8 +175,7 @@ class BBC(Config):
                 if item["kind"] == "video" and int(item["bitrate"]) > 3500:
                     videos = item["connection"]
         except KeyError:
-            error("Request failed. Make sure to use a valid UK IP-address")
-            exit(1)
+            raise RequestError("Request failed. Make sure to use a valid UK IP-address")
 
         for item in media["media"]:
             if item["kind"] == "captions":
@@ -182,7 +192,7 @@ class BBC(Config):
                 if caption["supplier"] == "mf_bidi" or "mf_cloudfront":
                     subtitle = caption["href"]
 
-        soup = BeautifulSoup(requests.get(manifest).content, "xml")
+        soup = BeautifulSoup(self.client.get(manifest).content, "xml")
 
         parse = urlparse(manifest)
         _path = parse.path.split("/")
@@ -203,10 +213,6 @@ class BBC(Config):
         if tag:
             soup = self.add_stream(soup, init)
 
-        with open(self.tmp / "manifest.mpd", "w") as f:
-            f.write(str(soup.prettify()))
-
-        self.soup = soup
         return soup, subtitle
 
     def get_mediainfo(self, soup: object, quality: str) -> str:
@@ -263,12 +269,7 @@ class BBC(Config):
         return content, title
 
     def get_episode_from_url(self, url: str):
-        html = self.client.get(url).text
-        redux = (
-            re.search("window.__IPLAYER_REDUX_STATE__ = (.*?);</script>", html)
-            .group(1)
-        )
-        data = json.loads(redux)
+        data = embedded_json(self.client, url, REDUX)
 
         subtitle = data["episode"]["subtitle"]
         season_match = re.search(r"Series (\d+):", subtitle)
@@ -320,37 +321,18 @@ class BBC(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
-
-    def clean_subtitles(self, subtitle: str, filename: str):
-        """
-        Temporary solution, but seems to work for the most part
-        """
-        with self.console.status("Cleaning up subtitles..."):
-            soup = BeautifulSoup(requests.get(subtitle).content, "xml")
-            for tag in soup.find_all():
-                if tag.name != "p" and tag.name != "br" and tag.name != "span":
-                    tag.unwrap()
-
-            for br in soup.find_all("br"):
-                br.replace_with(" ")
-
-            srt = ""
-            for i, tag in enumerate(soup.find_all("p")):
-                start = tag["begin"]
-                end = tag["end"]
-                text = tag.get_text().strip()
-                srt += f"{i+1}\n{start.replace('.', ',')} --> {end.replace('.', ',')}\n{text}\n\n"
-
-            with open(self.save_path / f"{filename}.srt", "w", encoding="UTF-8") as f:
-                f.write(srt)
-
-        self.sub_path = self.save_path / f"{filename}.srt"
+        playlist = lambda stream: self.get_playlist(stream.id)
+        with prefetch(downloads, playlist, workers=2, ahead=1) as self.playlists:
+            download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
-            soup, subtitle = self.get_playlist(stream.id)
+            soup, subtitle = self.playlists[stream].result()
+            with open(self.tmp / "manifest.mpd", "w") as f:
+                f.write(str(soup))
+
+            self.soup = soup
+            subtitle = Subtitle(self.client, subtitle, self.tmp) if subtitle else None
             res = self.get_mediainfo(soup, self.quality)
 
         if self.info:
@@ -360,21 +342,19 @@ class BBC(Config):
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = self.tmp / "manifest.mpd"
         self.key_file = None  # not encrypted
-        self.sub_path = None
-
-        if subtitle is not None:
-            self.clean_subtitles(subtitle, self.filename)
+        self.sub_path = subtitle.result(self) if subtitle else None
 
         info(f"{str(stream)}")
         click.echo("")
 
+        if self.sub_only and self.sub_path:
+            info(f"Subtitles saved to {self.sub_path}\n")
+            return
+
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
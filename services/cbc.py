@@ -8,9 +8,9 @@ Quality: up to 1080p and DDP5.1 audio
 
 """
 
-import subprocess
 import re
 
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from pathlib import Path
 from collections import Counter
@@ -18,8 +18,6 @@ from collections import Counter
 import click
 import yaml
 
-from bs4 import BeautifulSoup
-
 from utils.utilities import (
     info,
     string_cleaning,
@@ -30,6 +28,10 @@ from utils.utilities import (
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import download_all, run_downloader
+from utils import ism
+
+EC3 = re.compile(r"ec-?3", re.IGNORECASE)
 
 
 class CBC(Config):
@@ -162,21 +164,17 @@ class CBC(Config):
             ]
         )
 
-    def get_mediainfo(self, quality: int, m3u8: str) -> str:
-        resolutions = []
-
-        lines = m3u8.splitlines()
-
-        for line in lines:
-            if "RESOLUTION=" in line:
-                resolution = re.search("RESOLUTION=\d+x(\d+)", line).group(1)
-                resolutions.append(resolution)
-
-        resolutions.sort(key=lambda x: int(x), reverse=True)
+    def get_mediainfo(self, quality: int, streams: list) -> str:
+        resolutions = sorted(
+            {str(s.height) for s in streams if s.type == "video" and s.height},
+            key=int,
+            reverse=True,
+        )
 
-        if "ec3" in m3u8 and "best" in self.config["audio"]["track"]:
+        ec3 = any(EC3.search(s.codec) for s in streams)
+        if ec3 and "best" in self.config["audio"]["track"]:
             audio = "DDP5.1"
-        elif "ec3" in m3u8 and "ec3" in self.config["audio"]["track"]:
+        elif ec3 and "ec3" in self.config["audio"]["track"]:
             audio = "DDP5.1"
         else:
             audio = "AAC2.0"
@@ -193,74 +191,26 @@ class CBC(Config):
 
         return resolutions[0], audio
 
-    def get_hls(self, url: str):
+    def get_hls(self, url: str) -> tuple:
         base_url = url.split("desktop")[0]
         smooth = f"{base_url}QualityLevels(5999999)/Manifest(video,type=keyframes)"
 
-        video_stream = (
-            "#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},"
-            "RESOLUTION={width}x{height},"
-            'CODECS="avc1.4d401f,mp4a.40.2",'
-            'AUDIO="audio",'
-            'CLOSED-CAPTIONS="CC"\n{uri}QualityLevels({bitrate})/Manifest(video,format=m3u8-aapl)'
-        )
-        audio_stream = (
-            "#EXT-X-MEDIA:TYPE=AUDIO,"
-            'GROUP-ID="{id}",'
-            "BANDWIDTH={bandwidth},"
-            'NAME="{name}",'
-            'LANGUAGE="{language}",'
-            'URI="{uri}QualityLevels({bitrate})/Manifest({codec},format=m3u8-aapl)"'
-        )
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(ism.fetch, self.client, smooth)
+            m3u8 = self.client.get(url).text
+            manifest = future.result()
+
+        if manifest is None:
+            return url, ism.master_streams(m3u8)
+
+        m3u8 = m3u8.replace("QualityLevels", f"{base_url}QualityLevels")
+        streams = manifest.streams(base_url)
+
+        path = self.tmp / "manifest.m3u8"
+        with open(path, "w") as f:
+            f.write(ism.build_m3u8(m3u8, streams))
 
-        m3u8 = self.client.get(url).text
-
-        try:
-            self.xml = BeautifulSoup(self.client.get(smooth), "xml")
-        except ValueError:
-            self.xml = None
-
-        if self.xml:
-            m3u8 = re.sub(r"QualityLevels", f"{base_url}QualityLevels", m3u8)
-
-            indexes = self.xml.find_all("StreamIndex")
-            for index in indexes:
-                if index.attrs.get("Type") == "video":
-                    for level in index:
-                        if not level.attrs.get("Bitrate"):
-                            continue
-
-                        m3u8 += (
-                            video_stream.format(
-                                bandwidth=level.attrs.get("Bitrate", 0),
-                                width=level.attrs.get("MaxWidth", 0),
-                                height=level.attrs.get("MaxHeight", 0),
-                                uri=base_url,
-                                bitrate=level.attrs.get("Bitrate", 0),
-                            )
-                            + "\n"
-                        )
-
-                if index.attrs.get("Type") == "audio":
-                    levels = index.find_all("QualityLevel")
-                    for level in levels:
-                        m3u8 += (
-                            audio_stream.format(
-                                id=index.attrs.get("Name"),
-                                bandwidth=level.attrs.get("Bitrate", 0),
-                                name=level.attrs.get("FourCC"),
-                                language=index.attrs.get("Language"),
-                                uri=base_url,
-                                bitrate=level.attrs.get("Bitrate", 0),
-                                codec=index.attrs.get("Name"),
-                            )
-                            + "\n"
-                        )
-
-            with open(self.tmp / "manifest.m3u8", "w") as f:
-                f.write(m3u8)
-
-        return url, m3u8
+        return path, ism.master_streams(m3u8) + streams
 
     def get_playlist(self, playsession: str) -> tuple:
         response = self.client.get(playsession).json()
@@ -310,20 +260,19 @@ class CBC(Config):
         if self.titles:
             opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
-            mpd_url, m3u8 = self.get_playlist(stream.data)
-            res, audio = self.get_mediainfo(self.quality, m3u8)
+            manifest, streams = self.get_playlist(stream.data)
+            res, audio = self.get_mediainfo(self.quality, streams)
 
         # if self.info:
         #     print_info(self, stream, keys)
 
         self.filename = set_filename(self, stream, res, audio)
         self.save_path = set_save_path(stream, self.config, title)
-        self.manifest = self.tmp / "manifest.m3u8" if self.xml else mpd_url
+        self.manifest = manifest
         self.key_file = None  # Not encrypted
         self.sub_path = None
 
@@ -333,10 +282,7 @@ class CBC(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
@@ -9,11 +9,7 @@ This program will grab higher 1080p bitrate (if available)
 """
 
 import base64
-import re
-import subprocess
 import json
-import shutil
-import sys
 
 from pathlib import Path
 from collections import Counter
@@ -32,12 +28,14 @@ from utils.utilities import (
     print_info,
     set_filename,
 )
+from utils.cdm import local_cdm
+from utils.license import JSONCodec
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
-
-from pywidevine.L3.decrypt.wvdecryptcustom import WvDecrypt
-from pywidevine.L3.cdm import deviceconfig
+from utils.embedded import embedded_json, PARAMS
+from utils.retry import check, download_all, prefetch, run_downloader
+from utils.pssh import build_pssh
 
 
 class CHANNEL4(Config):
@@ -48,91 +46,23 @@ class CHANNEL4(Config):
             self.cfg = yaml.safe_load(f)
          
         self.config.update(self.cfg)
-        self.get_options()
-
-    def local_cdm(
-        self,
-        pssh: str,
-        lic_url: str,
-        manifest: str,
-        token: str,
-        asset: str,
-        cert_b64=None,
-    ) -> str:
-        wvdecrypt = WvDecrypt(
-            init_data_b64=pssh,
-            cert_data_b64=cert_b64,
-            device=deviceconfig.device_android_generic,
-        )
-        lic = self.get_license(
-            wvdecrypt.get_challenge(), lic_url, manifest, token, asset
-        )
 
-        wvdecrypt.update_license(lic)
-        status, content = wvdecrypt.start_process()
+        client = self.config[self.config["client"]]
+        self.key = base64.b64decode(client["key"])
+        self.iv = base64.b64decode(client["iv"])
 
-        if status:
-            return content
-        else:
-            raise ValueError("Unable to fetch decryption keys")
-
-    def get_license(
-        self,
-        challenge: bytes,
-        lic_url: str,
-        manifest: str,
-        token: str,
-        asset: str,
-    ) -> str:
-        r = self.client.post(
-            lic_url,
-            data=json.dumps(
-                {
-                    "message": base64.b64encode(challenge).decode("utf8"),
-                    "token": token,
-                    "request_id": asset,
-                    "video": {"type": "ondemand", "url": manifest},
-                }
-            ),
-            headers={"Content-Type": "application/json"},
-        )
-        if r.status_code != 200:
-            click.echo(f"Failed to get license! Error: {r.json()['status']['type']}")
-            sys.exit(1)
-        return r.json()["license"]
+        self.get_options()
 
     def decrypt_token(self, token: str) -> tuple:
-        if self.config["client"] == "android":
-            key = self.config["android"]["key"]
-            iv = self.config["android"]["iv"]
-
-        if self.config["client"] == "web":
-            key = self.config["web"]["key"]
-            iv = self.config["web"]["iv"]
-
         if isinstance(token, str):
             token = base64.b64decode(token)
-            cipher = AES.new(
-                key=base64.b64decode(key),
-                iv=base64.b64decode(iv),
-                mode=AES.MODE_CBC,
-            )
+            cipher = AES.new(key=self.key, iv=self.iv, mode=AES.MODE_CBC)
             data = unpad(cipher.decrypt(token), AES.block_size)
             license_api, dec_token = data.decode().split("|")
             return dec_token.strip(), license_api.strip()
 
     def get_data(self, url: str) -> dict:
-        r = self.client.get(url)
-        init_data = re.search(
-            "<script>window\.__PARAMS__ = (.*)</script>",
-            "".join(
-                r.content.decode()
-                .replace("\u200c", "")
-                .replace("\r\n", "")
-                .replace("undefined", "null")
-            ),
-        )
-        data = json.loads(init_data.group(1))
+        data = embedded_json(self.client, url, PARAMS, js=True)
         return data["initialData"]
 
     def get_series(self, url: str) -> Series:
@@ -144,8 +74,8 @@ class CHANNEL4(Config):
                     id_=None,
                     service="ALL4",
                     title=data["brand"]["title"],
-                    season=episode["seriesNumber"],
-                    number=episode["episodeNumber"],
+                    season=episode["seriesNumber"] or 0,
+                    number=episode["episodeNumber"] or 0,
                     name=episode["originalTitle"],
                     year=None,
                     data=episode.get("assetId"),
@@ -179,9 +109,7 @@ class CHANNEL4(Config):
             url = self.config["android"]["vod"].format(asset_id=asset_id)
 
             r = self.client.get(url)
-            if not r.is_success:
-                shutil.rmtree(self.tmp)
-                raise ValueError("Invalid assetID")
+            check(r, "Invalid assetID")
 
             soup = BeautifulSoup(r.text, "xml")
             token = soup.select_one("token").text
@@ -191,9 +119,7 @@ class CHANNEL4(Config):
             url = self.config["web"]["vod"].format(programmeId=episode_id)
 
             r = self.client.get(url)
-            if not r.is_success:
-                shutil.rmtree(self.tmp)
-                raise ValueError("Invalid programmeId")
+            check(r, "Invalid programmeId")
             
             data = json.loads(r.content)
 
@@ -205,21 +131,13 @@ class CHANNEL4(Config):
         return manifest, token
 
     def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        array_of_bytes = bytearray(b"\x00\x00\x002pssh\x00\x00\x00\x00")
-        array_of_bytes.extend(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        array_of_bytes.extend(b"\x00\x00\x00\x12\x12\x10")
-        array_of_bytes.extend(bytes.fromhex(kid.replace("-", "")))
-        return base64.b64encode(bytes.fromhex(array_of_bytes.hex())).decode("utf-8")
-
-    def get_mediainfo(self, manifest: str, quality: str) -> str:
-        self.soup = BeautifulSoup(self.client.get(manifest), "xml")
-        pssh = self.get_pssh(self.soup)
-        elements = self.soup.find_all("Representation")
+        kid = soup.select_one("ContentProtection").attrs.get("cenc:default_KID")
+        return build_pssh(kid)
+
+    def get_mediainfo(self, manifest: str, quality: str) -> tuple:
+        soup = BeautifulSoup(self.client.get(manifest), "xml")
+        pssh = self.get_pssh(soup)
+        elements = soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
             reverse=True,
@@ -227,13 +145,29 @@ class CHANNEL4(Config):
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, pssh, soup
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
                 info(f"Resolution not available. Getting closest match:")
-                return closest_match, pssh
-
-        return heights[0], pssh
+                return closest_match, pssh, soup
+
+        return heights[0], pssh, soup
+
+    def resolve(self, stream: object) -> tuple:
+        """Manifest, resolution and keys for a title, ready for the downloader"""
+        manifest, token = self.get_playlist(stream.data, stream.id)
+        res, pssh, soup = self.get_mediainfo(manifest, self.quality)
+        token, license_url = self.decrypt_token(token)
+
+        codec = JSONCodec(
+            {
+                "token": token,
+                "request_id": stream.data,
+                "video": {"type": "ondemand", "url": manifest},
+            }
+        )
+        keys = local_cdm(pssh, license_url, self.client, codec=codec)
+        return manifest, res, soup, keys
 
     def get_content(self, url: str) -> object:
         if self.movie:
@@ -303,17 +237,12 @@ class CHANNEL4(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        with prefetch(downloads, self.resolve, workers=2, ahead=1) as self.resolving:
+            download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
-        with self.console.status("Getting media info..."):
-            manifest, token = self.get_playlist(stream.data, stream.id)
-            res, pssh = self.get_mediainfo(manifest, self.quality)
-            token, license_url = self.decrypt_token(token)
-
-        with self.console.status("Getting decryption keys..."):
-            keys = self.local_cdm(pssh, license_url, manifest, token, stream.data)
+        with self.console.status("Getting media info and keys..."):
+            manifest, res, self.soup, keys = self.resolving[stream].result()
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
 
@@ -333,10 +262,7 @@ class CHANNEL4(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
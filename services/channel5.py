@@ -9,12 +9,11 @@ Channel5 now offers up to 1080p
 """
 
 import base64
-import subprocess
 import json
 import hmac
 import hashlib
-import shutil
 import re
+import threading
 
 from urllib.parse import urlparse, urlunparse
 from collections import Counter
@@ -36,10 +35,13 @@ from utils.utilities import (
     print_info,
     set_filename,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import check, download_all, prefetch, run_downloader
+from utils.pssh import default_kids
+from utils.cache import TTLCache
 
 
 class CHANNEL5(Config):
@@ -51,13 +53,30 @@ class CHANNEL5(Config):
 
         self.config.update(self.cfg)
 
-        self.gist = self.client.get(
-            self.config["gist"].format(
-                timestamp=datetime.now().timestamp()
-        )).json()
+        self.cache = TTLCache("channel5", ttl=21600)
+        self.gist_lock = threading.Lock()
+        self.gist = self.load_gist()
 
         self.get_options()
 
+    def load_gist(self, stale: dict = None) -> dict:
+        """
+        HMAC secret and AES key, cached for a few hours
+
+        Passing the gist that just failed forces a refetch, unless another
+        thread has already replaced it
+        """
+        with self.gist_lock:
+            gist = self.cache.get("gist")
+            if gist is None or gist == stale:
+                url = self.config["gist"].format(timestamp=datetime.now().timestamp())
+                r = self.client.get(url)
+                check(r, "Failed to fetch keys")
+                gist = self.cache.set("gist", r.json())
+
+            self.gist = gist
+            return gist
+
     def get_data(self, url: str) -> json:
         show = urlparse(url).path.split("/")[2]
         url = self.config["content"].format(show=show)
@@ -102,14 +121,11 @@ class CHANNEL5(Config):
             ]
         )
 
-    def decrypt_data(self, media: str) -> dict:
-        key = base64.b64decode(self.gist["key"])
+    def decrypt_data(self, media: str, gist: dict) -> dict:
+        key = base64.b64decode(gist["key"])
 
         r = self.client.get(media)
-        if not r.is_success:
-            print(f"{r}\n{r.content}")
-            shutil.rmtree(self.tmp)
-            exit(1)
+        check(r, "Failed to fetch media")
 
         content = r.json()
 
@@ -120,18 +136,22 @@ class CHANNEL5(Config):
         decrypted_data = unpad(cipher.decrypt(data), AES.block_size)
         return json.loads(decrypted_data)
 
-    def get_playlist(self, asset_id: str) -> tuple:
-        secret = self.gist["hmac"]
-
+    def sign(self, asset_id: str, gist: dict) -> str:
         timestamp = datetime.now().timestamp()
         vod = self.config["vod"].format(
             id=asset_id, timestamp=f"{timestamp}"
         )
-        sig = hmac.new(base64.b64decode(secret), vod.encode(), hashlib.sha256)
+        sig = hmac.new(base64.b64decode(gist["hmac"]), vod.encode(), hashlib.sha256)
         auth = base64.urlsafe_b64encode(sig.digest()).decode()
-        vod += f"&auth={auth}"
+        return f"{vod}&auth={auth}"
 
-        data = self.decrypt_data(vod)
+    def get_playlist(self, asset_id: str) -> tuple:
+        gist = self.gist
+        try:
+            data = self.decrypt_data(self.sign(asset_id, gist), gist)
+        except ValueError:
+            gist = self.load_gist(stale=gist)
+            data = self.decrypt_data(self.sign(asset_id, gist), gist)
 
         asset = [x for x in data["assets"] if x["drm"] == "widevine"][0]
         rendition = asset["renditions"][0]
@@ -146,21 +166,9 @@ class CHANNEL5(Config):
 
         return manifest, lic_url
 
-    def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        array_of_bytes = bytearray(b"\x00\x00\x002pssh\x00\x00\x00\x00")
-        array_of_bytes.extend(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        array_of_bytes.extend(b"\x00\x00\x00\x12\x12\x10")
-        array_of_bytes.extend(bytes.fromhex(kid.replace("-", "")))
-        return base64.b64encode(bytes.fromhex(array_of_bytes.hex())).decode("utf-8")
-
     def get_mediainfo(self, manifest: str, quality: str) -> tuple:
         self.soup = BeautifulSoup(self.client.get(manifest), "xml")
-        pssh = self.get_pssh(self.soup)
+        kids = default_kids(self.soup)
         elements = self.soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
@@ -169,13 +177,13 @@ class CHANNEL5(Config):
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, kids
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
                 info(f"Resolution not available. Getting closest match:")
-                return closest_match, pssh
+                return closest_match, kids
 
-        return heights[0], pssh
+        return heights[0], kids
 
     def get_content(self, url: str) -> tuple[Movies | Series, str]:
         if self.movie:
@@ -264,19 +272,18 @@ class CHANNEL5(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        playlist = lambda stream: self.get_playlist(stream.data)
+        with prefetch(downloads, playlist, workers=2, ahead=1) as self.playlists:
+            download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
-            manifest, lic_url = self.get_playlist(stream.data)
-            res, pssh = self.get_mediainfo(manifest, self.quality)
+            manifest, lic_url = self.playlists[stream].result()
+            res, kids = self.get_mediainfo(manifest, self.quality)
 
         with self.console.status("Getting decryption keys..."):
-            keys = (
-                remote_cdm(pssh, lic_url, self.client)
-                if self.remote
-                else local_cdm(pssh, lic_url, self.client)
+            keys = get_keys(
+                kids, lic_url, self.client, remote=self.remote
             )
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
@@ -298,10 +305,7 @@ class CHANNEL5(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
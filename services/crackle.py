@@ -8,11 +8,7 @@ Info:
 
 """
 
-import subprocess
 import json
-import shutil
-import sys
-import base64
 
 from urllib.parse import urlparse
 from collections import Counter
@@ -31,10 +27,12 @@ from utils.utilities import (
     print_info,
     set_filename,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import download_all, RequestError, run_downloader
+from utils.pssh import default_kids
 
 
 class CRACKLE(Config):
@@ -62,9 +60,7 @@ class CRACKLE(Config):
 
         r = self.client.get(f"{self.api}/content/{self.video_id}")
         if not r.is_success:
-            print(f"\nError! {r.status_code}\n{r.json()['error']['message']}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
+            raise RequestError(f"Error! {r.status_code}: {r.json()['error']['message']}")
 
         return r.json()["data"]
 
@@ -134,23 +130,11 @@ class CRACKLE(Config):
 
         return lic_url, manifest
 
-    def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        array_of_bytes = bytearray(b"\x00\x00\x002pssh\x00\x00\x00\x00")
-        array_of_bytes.extend(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        array_of_bytes.extend(b"\x00\x00\x00\x12\x12\x10")
-        array_of_bytes.extend(bytes.fromhex(kid.replace("-", "")))
-        return base64.b64encode(bytes.fromhex(array_of_bytes.hex())).decode("utf-8")
-
     def get_mediainfo(self, manifest: str, quality: str) -> str:
         soup = BeautifulSoup(self.client.get(manifest), "xml")
         new_manifest = soup.select_one("BaseURL").text + "index.mpd"
         self.soup = BeautifulSoup(self.client.get(new_manifest), "xml")
-        pssh = self.get_pssh(self.soup)
+        kids = default_kids(self.soup)
         elements = self.soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
@@ -159,13 +143,13 @@ class CRACKLE(Config):
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, kids
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
                 info(f"Resolution not available. Getting closest match:")
-                return closest_match, pssh
+                return closest_match, kids
 
-        return heights[0], pssh
+        return heights[0], kids
 
     def get_content(self, url: str) -> object:
         if self.movie:
@@ -240,19 +224,16 @@ class CRACKLE(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             lic_url, manifest = self.get_playlist(stream.data)
-            res, pssh = self.get_mediainfo(manifest, self.quality)
+            res, kids = self.get_mediainfo(manifest, self.quality)
 
         with self.console.status("Getting decryption keys..."):
-            keys = (
-                remote_cdm(pssh, lic_url, self.client)
-                if self.remote
-                else local_cdm(pssh, lic_url, self.client)
+            keys = get_keys(
+                kids, lic_url, self.client, remote=self.remote
             )
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
@@ -274,10 +255,7 @@ class CRACKLE(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
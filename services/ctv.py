@@ -6,19 +6,13 @@ Quality: up to 1080p and Dolby 5.1 audio
 
 """
 
-import base64
-import subprocess
 import json
-import asyncio
-import shutil
-import sys
 
 from urllib.parse import urlparse
 from pathlib import Path
 from collections import Counter
 
 import click
-import httpx
 import yaml
 
 from bs4 import BeautifulSoup
@@ -28,13 +22,17 @@ from utils.utilities import (
     string_cleaning,
     set_save_path,
     print_info,
-    add_subtitles,
     set_filename,
 )
 from utils.cdm import local_cdm, remote_cdm
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import check, download_all, run_downloader
+from utils.pssh import init_pssh, mpd_pssh
+from utils.subtitles.fetch import Subtitle
+from utils.cache import TTLCache
+from utils.graphql import GraphQL, Operation
 
 
 class CTV(Config):
@@ -48,16 +46,16 @@ class CTV(Config):
 
         self.lic_url = self.config["lic"]
         self.api = self.config["api"]
-        
+        self.graphql = GraphQL(self.client, self.api, TTLCache("ctv", ttl=3600))
+
         self.get_options()
 
     def get_title_id(self, url: str) -> str:
         path = urlparse(url).path
 
-        payload = {
-            "operationName": "resolvePath",
-            "variables": {"path": f"{path}"},
-            "query": """
+        data = self.graphql.query(
+            "resolvePath",
+            """
             query resolvePath($path: String!) {
                 resolvedPath(path: $path) {
                     lastSegment {
@@ -68,17 +66,17 @@ class CTV(Config):
                 }
             }
             """,
-        }
-        r = self.client.post(self.api, json=payload).json()
-        return r["data"]["resolvedPath"]["lastSegment"]["content"]["id"]
+            {"path": f"{path}"},
+            ttl=604800,
+        )
+        return data["resolvedPath"]["lastSegment"]["content"]["id"]
 
     def get_series_data(self, url: str) -> json:
         title_id = self.get_title_id(url)
 
-        payload = {
-            "operationName": "axisMedia",
-            "variables": {"axisMediaId": f"{title_id}"},
-            "query": """
+        return self.graphql.query(
+            "axisMedia",
+            """
                 query axisMedia($axisMediaId: ID!) {
                     contentData: axisMedia(id: $axisMediaId) {
                         title
@@ -94,17 +92,15 @@ class CTV(Config):
                     }
                 }
                 """,
-        }
-
-        return self.client.post(self.api, json=payload).json()["data"]
+            {"axisMediaId": f"{title_id}"},
+        )
 
     def get_movie_data(self, url: str) -> json:
         title_id = self.get_title_id(url)
 
-        payload = {
-            "operationName": "axisMedia",
-            "variables": {"axisMediaId": f"{title_id}"},
-            "query": """
+        return self.graphql.query(
+            "axisMedia",
+            """
                 query axisMedia($axisMediaId: ID!) {
                     contentData: axisMedia(id: $axisMediaId) {
                         title
@@ -119,15 +115,13 @@ class CTV(Config):
                     }
                 }
                 """,
-        }
-
-        return self.client.post(self.api, json=payload).json()["data"]
+            {"axisMediaId": f"{title_id}"},
+        )
 
-    async def fetch_titles(self, async_client: httpx.AsyncClient, id: str) -> json:
-        payload = {
-            "operationName": "season",
-            "variables": {"seasonId": f"{id}"},
-            "query": """
+    def season(self, id: str) -> Operation:
+        return Operation(
+            "season",
+            """
                 query season($seasonId: ID!) {
                     axisSeason(id: $seasonId) {
                         episodes {
@@ -145,19 +139,18 @@ class CTV(Config):
                     }
                 }
                 """,
-        }
-        response = await async_client.post(self.api, json=payload)
-        return response.json()["data"]["axisSeason"]["episodes"]
+            {"seasonId": f"{id}"},
+        )
 
-    async def get_titles(self, data: dict) -> list:
-        async with httpx.AsyncClient() as async_client:
-            tasks = [self.fetch_titles(async_client, x["id"]) for x in data]
-            titles = await asyncio.gather(*tasks)
-            return [episode for episodes in titles for episode in episodes]
+    def get_titles(self, data: dict) -> list:
+        seasons = self.graphql.execute(*(self.season(x["id"]) for x in data))
+        return [
+            episode for season in seasons for episode in season["axisSeason"]["episodes"]
+        ]
 
     def get_series(self, url: str) -> Series:
         data = self.get_series_data(url)
-        titles = asyncio.run(self.get_titles(data["contentData"]["seasons"]))
+        titles = self.get_titles(data["contentData"]["seasons"])
 
         return Series(
             [
@@ -200,10 +193,7 @@ class CTV(Config):
         base = f"https://capi.9c9media.com/destinations/{hub}/platforms/desktop"
 
         r = self.client.get(f"{base}/contents/{id}/contentPackages")
-        if not r.is_success:
-            print(f"\nError! {r.status_code}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
+        check(r, "Failed to fetch content packages")
 
         pkg_id = r.json()["Items"][0]["Id"]
         base += "/playback/contents"
@@ -213,6 +203,10 @@ class CTV(Config):
         return manifest, subtitle
 
     def get_pssh(self, soup):
+        pssh = mpd_pssh(soup)
+        if pssh:
+            return pssh
+
         try:
             base = soup.select_one("BaseURL").text
         except AttributeError:
@@ -225,19 +219,9 @@ class CTV(Config):
             .replace("$RepresentationID$", f"{rep_id}")
         )
 
-        r = self.client.get(f"{base}{template}")
-
-        with open(self.tmp / "init.mp4", "wb") as f:
-            f.write(r.content)
+        return init_pssh(self.client, f"{base}{template}")
 
-        path = Path(self.tmp / "init.mp4")
-        raw = Path(path).read_bytes()
-        wv = raw.rfind(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        if wv == -1:
-            return None
-        return base64.b64encode(raw[wv - 12 : wv - 12 + raw[wv - 9]]).decode("utf-8")
-
-    def get_mediainfo(self, manifest: str, quality: str, subtitle: str) -> str:
+    def get_mediainfo(self, manifest: str, quality: str) -> str:
         soup = BeautifulSoup(self.client.get(manifest), "xml")
         pssh = self.get_pssh(soup)
 
@@ -262,7 +246,7 @@ class CTV(Config):
 
         audio = "DD5.1" if "ac-3" in codecs else "AAC2.0"
 
-        self.soup = add_subtitles(soup, subtitle)
+        self.soup = soup
 
         with open(self.tmp / "manifest.mpd", "w") as f:
             f.write(str(self.soup.prettify()))
@@ -303,10 +287,9 @@ class CTV(Config):
     def get_episode_from_url(self, url: str):
         title_id = self.get_title_id(url)
 
-        payload = {
-            "operationName": "axisContent",
-            "variables": {"id": f"{title_id}"},
-            "query": """
+        data = self.graphql.query(
+            "axisContent",
+            """
                 query axisContent($id: ID!) {
                     axisContent(id: $id) {
                         axisId
@@ -325,9 +308,8 @@ class CTV(Config):
                     }
                 }
                 """,
-        }
-        
-        data = self.client.post(self.api, json=payload).json()["data"]["axisContent"]
+            {"id": f"{title_id}"},
+        )["axisContent"]
 
         episode = Series(
             [
@@ -371,13 +353,13 @@ class CTV(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             manifest, subtitle = self.get_playlist(stream.data, stream.id)
-            res, pssh, audio = self.get_mediainfo(manifest, self.quality, subtitle)
+            subtitle = Subtitle(self.client, subtitle, self.tmp)
+            res, pssh, audio = self.get_mediainfo(manifest, self.quality)
 
         with self.console.status("Getting decryption keys..."):
             keys = (
@@ -395,20 +377,21 @@ class CTV(Config):
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = self.tmp / "manifest.mpd"
         self.key_file = self.tmp / "keys.txt"
-        self.sub_path = None
+        self.sub_path = subtitle.result(self)
 
         info(f"{str(stream)}")
         for key in keys:
             info(f"{key}")
         click.echo("")
 
+        if self.sub_only and self.sub_path:
+            info(f"Subtitles saved to {self.sub_path}\n")
+            return
+
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
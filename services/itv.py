@@ -9,17 +9,10 @@ ITV L3 is 720p, AAC 2.0 max
 
 """
 
-import base64
-import subprocess
-import json
-import shutil
-import sys
-
 from collections import Counter
 from pathlib import Path
 
 import click
-import requests
 import yaml
 
 from bs4 import BeautifulSoup
@@ -30,12 +23,15 @@ from utils.utilities import (
     set_save_path,
     print_info,
     set_filename,
-    add_subtitles,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.embedded import embedded_json, NEXT_DATA
+from utils.retry import check, download_all, run_downloader
+from utils.pssh import default_kids
+from utils.subtitles.fetch import Subtitle
 
 
 class ITV(Config):
@@ -49,9 +45,7 @@ class ITV(Config):
         self.get_options()
 
     def get_data(self, url: str) -> dict:
-        soup = BeautifulSoup(self.client.get(url), "html.parser")
-        props = soup.select_one("#__NEXT_DATA__").text
-        data = json.loads(props)
+        data = embedded_json(self.client, url, NEXT_DATA)
         return data["props"]["pageProps"]
 
     def get_series(self, url: str) -> Series:
@@ -106,10 +100,7 @@ class ITV(Config):
         }
 
         r = self.client.post(playlist, json=payload)
-        if not r.is_success:
-            click.echo(f"\n\nError! {r.status_code}\n{r.content}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
+        check(r, "Failed to fetch playlist")
 
         data = r.json()
 
@@ -122,26 +113,12 @@ class ITV(Config):
 
         return mpd_url, lic_url, subtitle
 
-    def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        version = "3870737368"
-        system_id = "EDEF8BA979D64ACEA3C827DCD51D21ED"
-        data = "48E3DC959B06"
-        s = f"000000{version}00000000{system_id}000000181210{kid}{data}"
-        return base64.b64encode(bytes.fromhex(s)).decode()
-
-    def get_mediainfo(self, manifest: str, quality: str, subtitle: str) -> str:
-        r = requests.get(manifest)
-        if not r.ok:
-            click.echo(f"\n\nError! {r.status_code}\n{r.content}")
-            sys.exit(1)
+    def get_mediainfo(self, manifest: str, quality: str) -> str:
+        r = self.client.get(manifest)
+        check(r, "Failed to fetch manifest")
 
         self.soup = BeautifulSoup(r.content, "xml")
-        pssh = self.get_pssh(self.soup)
+        kids = default_kids(self.soup)
         elements = self.soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
@@ -157,20 +134,17 @@ class ITV(Config):
             segment["media"] += params
             segment["initialization"] += params
 
-        if subtitle is not None:
-            self.soup = add_subtitles(self.soup, subtitle)
-
         with open(self.tmp / "manifest.mpd", "w") as f:
             f.write(str(self.soup.prettify()))
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, kids
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
-                return closest_match, pssh
+                return closest_match, kids
 
-        return heights[0], pssh
+        return heights[0], kids
 
     def get_content(self, url: str) -> object:
         if self.movie:
@@ -240,19 +214,17 @@ class ITV(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             manifest, lic_url, subtitle = self.get_playlist(stream.data)
-            res, pssh = self.get_mediainfo(manifest, self.quality, subtitle)
+            subtitle = Subtitle(self.client, subtitle, self.tmp) if subtitle else None
+            res, kids = self.get_mediainfo(manifest, self.quality)
 
         with self.console.status("Getting decryption keys..."):
-            keys = (
-                remote_cdm(pssh, lic_url, self.client)
-                if self.remote
-                else local_cdm(pssh, lic_url, self.client)
+            keys = get_keys(
+                kids, lic_url, self.client, remote=self.remote, protection_scheme="cenc"
             )
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
@@ -264,20 +236,21 @@ class ITV(Config):
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = self.tmp / "manifest.mpd"
         self.key_file = self.tmp / "keys.txt"
-        self.sub_path = None
+        self.sub_path = subtitle.result(self) if subtitle else None
 
         info(f"{str(stream)}")
         for key in keys:
             info(f"{key}")
         click.echo("")
 
+        if self.sub_only and self.sub_path:
+            info(f"Subtitles saved to {self.sub_path}\n")
+            return
+
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
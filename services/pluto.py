@@ -16,9 +16,8 @@ Pluto's library is very spotty, so it's highly recommended to use --titles befor
 
 """
 
-import base64
 import re
-import subprocess
+import time
 import uuid
 
 from urllib.parse import urlparse
@@ -26,6 +25,7 @@ from collections import Counter
 from pathlib import Path
 
 import click
+import httpx
 import yaml
 
 from bs4 import BeautifulSoup
@@ -37,10 +37,16 @@ from utils.utilities import (
     # print_info,
     set_filename,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import download_all, prefetch, run_downloader
+from utils.pssh import default_kids
+from utils.cache import TTLCache, token_expiry
+from utils.license import Codec
+
+SILO = "silo-hybrik.pluto.tv.s3.amazonaws.com"
 
 
 class PLUTO(Config):
@@ -61,13 +67,11 @@ class PLUTO(Config):
 
         self.lic_url = self.config["lic"]
         self.api = self.config["api"]
+        self.cache = TTLCache("pluto", ttl=86400)
 
         self.get_options()
 
-    def get_data(self, url: str) -> dict:
-        type = urlparse(url).path.split("/")[3]
-        video_id = urlparse(url).path.split("/")[4]
-
+    def start_session(self) -> dict:
         params = {
             "appName": "web",
             "appVersion": "na",
@@ -88,17 +92,26 @@ class PLUTO(Config):
             "https://boot.pluto.tv/v4/start", params=params
         ).json()
 
-        self.token = response["sessionToken"]
+        token = response["sessionToken"]
+        expires = token_expiry(token, default=time.time() + 3600) - 300
+        session = {"token": token, "params": params}
+        return self.cache.set("session", session, expires=expires)
+
+    def get_data(self, url: str) -> dict:
+        type = urlparse(url).path.split("/")[3]
+        video_id = urlparse(url).path.split("/")[4]
+
+        session = self.cache.get("session") or self.start_session()
+        self.params = session["params"]
+        self.auth = {"Authorization": f"Bearer {session['token']}"}
 
         info = (
             f"{self.api}/series/{video_id}/seasons"
             if type == "series"
             else f"{self.api}/items?ids={video_id}"
         )
-        self.client.headers.update({"Authorization": f"Bearer {self.token}"})
-        self.client.params = params
 
-        return self.client.get(info).json()
+        return self.client.get(info, headers=self.auth, params=self.params).json()
 
     def get_series(self, url: str) -> Series:
         data = self.get_data(url)
@@ -139,7 +152,8 @@ class PLUTO(Config):
         base = "https://cfd-v4-service-stitcher-dash-use1-1.prd.pluto.tv/v2"
 
         url = f"{base}{stitch}"
-        soup = BeautifulSoup(self.client.get(url), "xml")
+        r = self.client.get(url, headers=self.auth, params=self.params)
+        soup = BeautifulSoup(r, "xml")
         base_urls = soup.find_all("BaseURL")
         for base_url in base_urls:
             if base_url.text.endswith("end/"):
@@ -150,36 +164,27 @@ class PLUTO(Config):
         _path = "/".join(_path[:-3])
         new_path = f"{_path}/dash/0-end/main.mpd"
 
-        return parse._replace(
-            scheme="http",
-            netloc="silo-hybrik.pluto.tv.s3.amazonaws.com",
-            path=f"{new_path}",
-        ).geturl()
+        return parse._replace(scheme="http", netloc=SILO, path=new_path).geturl()
 
     def get_hls(self, stitch: str):
         base = "https://cfd-v4-service-channel-stitcher-use1-1.prd.pluto.tv"
 
         url = f"{base}{stitch}"
-        response = self.client.get(url).text
+        response = self.client.get(url, headers=self.auth, params=self.params).text
         pattern = r"#EXT-X-STREAM-INF:PROGRAM-ID=1,BANDWIDTH=(\d+)"
         matches = re.findall(pattern, response)
 
         max_bandwidth = sorted(matches, key=int, reverse=True)
         url = url.replace("master.m3u8", f"{max_bandwidth[0]}/playlist.m3u8")
 
-        response = self.client.get(url).text
+        response = self.client.get(url, headers=self.auth, params=self.params).text
         segment = re.search(
             r"^(https?://.*/)0\-(end|[0-9]+)/[^/]+\.ts$", response, re.MULTILINE
         ).group(1)
 
         parse = urlparse(f"{segment}0-end/master.m3u8")
 
-        master = parse._replace(
-            scheme="http",
-            netloc="silo-hybrik.pluto.tv.s3.amazonaws.com",
-        ).geturl()
-
-        self.client.headers.pop("Authorization")
+        master = parse._replace(scheme="http", netloc=SILO).geturl()
         response = self.client.get(master).text
 
         matches = re.findall(r"hls_(\d+).m3u8", response)
@@ -199,29 +204,26 @@ class PLUTO(Config):
         if stitched.endswith(".m3u8"):
             return self.get_hls(stitched)
 
-    def generate_pssh(self, kid: str):
-        array_of_bytes = bytearray(b"\x00\x00\x002pssh\x00\x00\x00\x00")
-        array_of_bytes.extend(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        array_of_bytes.extend(b"\x00\x00\x00\x12\x12\x10")
-        array_of_bytes.extend(bytes.fromhex(kid.replace("-", "")))
-        return base64.b64encode(bytes.fromhex(array_of_bytes.hex())).decode("utf-8")
-
-    def get_pssh(self, manifest: str) -> str:
-        self.client.headers.pop("Authorization")
+    def get_kids(self, manifest: str) -> list:
         soup = BeautifulSoup(self.client.get(manifest), "xml")
-        tags = soup.find_all("ContentProtection")
-        kids = set(
-            [
-                x.attrs.get("cenc:default_KID").replace("-", "")
-                for x in tags
-                if x.attrs.get("cenc:default_KID")
-            ]
-        )
-
-        return [self.generate_pssh(kid) for kid in kids]
+        return default_kids(soup)
 
     def get_mediainfo(self, manifest: str) -> str:
-        return self.get_pssh(manifest) if manifest.endswith(".mpd") else None
+        return self.get_kids(manifest) if manifest.endswith(".mpd") else None
+
+    def resolve(self, stream: object) -> tuple:
+        """
+        Silo manifest and KIDs for a title
+
+        The stitcher to silo mapping doesn't change between sessions, so it's
+        kept in the cache and later runs skip straight to the download
+        """
+
+        def lookup() -> list:
+            manifest = self.get_playlist(stream.data)
+            return [manifest, self.get_mediainfo(manifest)]
+
+        return tuple(self.cache.get_or_set(stream.data, lookup))
 
     def get_content(self, url: str) -> object:
         if self.movie:
@@ -261,31 +263,31 @@ class PLUTO(Config):
         if self.titles:
             opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        with prefetch(downloads, self.resolve) as self.resolving:
+            download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
-            manifest = self.get_playlist(stream.data)
-            pssh = self.get_mediainfo(manifest)
-            self.client.headers.update({"Authorization": f"Bearer {self.token}"})
-        
+            manifest, kids = self.resolving[stream].result()
+
         keys = None
-        if pssh is not None:
+        if kids:
+            lic_url = str(httpx.URL(self.lic_url, params=self.params))
             with self.console.status("Getting decryption keys..."):
-                keys = [
-                    remote_cdm(key, self.lic_url, self.client)
-                    if self.remote
-                    else local_cdm(key, self.lic_url, self.client)
-                    for key in pssh
-                ]
+                keys = get_keys(
+                    kids,
+                    lic_url,
+                    self.client,
+                    remote=self.remote,
+                    codec=Codec(headers=self.auth),
+                )
                 with open(self.tmp / "keys.txt", "w") as file:
-                    file.write("\n".join(key[0] for key in keys))
+                    file.write("\n".join(keys))
 
         self.filename = set_filename(self, stream, res=None, audio="AAC2.0")
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = manifest
-        self.key_file = self.tmp / "keys.txt" if pssh else None
+        self.key_file = self.tmp / "keys.txt" if kids else None
         self.sub_path = None
 
         info(f"{str(stream)}")
@@ -294,10 +296,7 @@ class PLUTO(Config):
         args, file_path = get_args(self, res="")
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
@@ -9,7 +9,6 @@ This program will grab higher 1080p bitrate and Dolby 5.1 audio (if available)
 
 """
 
-import subprocess
 import urllib
 import json
 import asyncio
@@ -27,6 +26,7 @@ from bs4 import BeautifulSoup
 
 from utils.utilities import (
     info,
+    error,
     string_cleaning,
     set_save_path,
     print_info,
@@ -36,6 +36,11 @@ from utils.cdm import local_cdm, remote_cdm
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import check, download_all, run_downloader
+from utils.pssh import build_pssh
+
+CSRF = "https://therokuchannel.roku.com/api/v1/csrf"
+
 
 class ROKU(Config):
     def __init__(self, config, **kwargs):
@@ -47,6 +52,8 @@ class ROKU(Config):
         self.config.update(self.cfg)
 
         self.api = self.config["api"]
+        self.concurrency = int(self.config.get("concurrency", 8))
+        self.csrf = None
         self.get_options()
 
     def get_data(self, url: str) -> json:
@@ -59,18 +66,39 @@ class ROKU(Config):
                 "Request failed. IP-address is either blocked or content is premium"
             )
 
-    async def fetch_titles(self, async_client: httpx.AsyncClient, id: str) -> json:
-        response = await async_client.get(f"{self.api}{id}")
+    async def fetch_titles(
+        self, async_client: httpx.AsyncClient, semaphore: asyncio.Semaphore, id: str
+    ) -> json:
+        async with semaphore:
+            response = await async_client.get(f"{self.api}{id}")
+        check(response, "Failed to fetch episode")
         return response.json()
 
     async def get_titles(self, data: dict) -> list:
-        async with httpx.AsyncClient() as async_client:
-            tasks = [
-                self.fetch_titles(async_client, x["meta"]["id"])
-                for x in data["episodes"]
-            ]
+        """
+        Episode details, at most self.concurrency requests at a time
+
+        Episodes that can't be fetched are reported and left out rather than
+        failing the whole series
+        """
+        ids = [x["meta"]["id"] for x in data["episodes"]]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self.async_client() as async_client:
+            episodes = await asyncio.gather(
+                *(self.fetch_titles(async_client, semaphore, id) for id in ids),
+                return_exceptions=True,
+            )
+
+        failed = [
+            (id, e) for id, e in zip(ids, episodes) if isinstance(e, Exception)
+        ]
+        for id, e in failed:
+            error(f"Episode {id}: {e}")
+        if failed:
+            info(f"{len(failed)}/{len(ids)} episodes could not be fetched\n")
 
-            return await asyncio.gather(*tasks)
+        return [x for x in episodes if not isinstance(x, Exception)]
 
     def get_series(self, url: str) -> Series:
         data = self.get_data(url)
@@ -110,16 +138,13 @@ class ROKU(Config):
             ]
         )
 
-    def get_playlist(self, id: str) -> tuple:
-        response = self.client.get("https://therokuchannel.roku.com/api/v1/csrf").json()
-
-        token = response["csrf"]
+    def get_csrf(self, refresh: bool = False) -> str:
+        """CSRF token for the session cookies, fetched once and reused"""
+        if refresh or self.csrf is None:
+            self.csrf = self.client.get(CSRF).json()["csrf"]
+        return self.csrf
 
-        headers = {
-            "csrf-token": token,
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
-            (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
-        }
+    def get_playlist(self, id: str) -> tuple:
         payload = {
             "rokuId": id,
             "mediaFormat": "mpeg-dash",
@@ -130,9 +155,13 @@ class ROKU(Config):
 
         url = self.config["vod"]
 
-        response = self.client.post(
-            url, headers=headers, cookies=self.client.cookies, json=payload
-        ).json()
+        headers = {"csrf-token": self.get_csrf()}
+        r = self.client.post(url, headers=headers, json=payload)
+        if r.status_code in (401, 403):
+            headers = {"csrf-token": self.get_csrf(refresh=True)}
+            r = self.client.post(url, headers=headers, json=payload)
+
+        response = r.json()
 
         try:
             videos = response["playbackMedia"]["videos"]
@@ -246,11 +275,10 @@ class ROKU(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
-        pssh = "AAAAKXBzc2gAAAAA7e+LqXnWSs6jyCfc1R0h7QAAAAkiASpI49yVmwY="
+        pssh = build_pssh(content_id=b"*", protection_scheme="cenc")
 
         with self.console.status("Getting media info..."):
             lic_url, manifest = self.get_playlist(stream.data)
@@ -282,10 +310,7 @@ class ROKU(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
@@ -9,11 +9,6 @@ Quality: 1080p, AAC 2.0 max
 
 """
 
-import base64
-import subprocess
-import json
-import shutil
-import sys
 import urllib.parse
 
 from collections import Counter
@@ -31,10 +26,14 @@ from utils.utilities import (
     print_info,
     set_filename,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series
 from utils.args import Options, get_args
+from utils.brightcove import Brightcove
 from utils.config import Config
+from utils.embedded import embedded_json, NEXT_DATA
+from utils.retry import download_all, run_downloader
+from utils.pssh import default_kids
 
 
 class STV(Config):
@@ -52,9 +51,7 @@ class STV(Config):
         self.get_options()
 
     def get_data(self, url: str) -> tuple:
-        soup = BeautifulSoup(self.client.get(url), "html.parser")
-        props = soup.select_one("#__NEXT_DATA__").text
-        data = json.loads(props)
+        data = embedded_json(self.client, url, NEXT_DATA)
         data = data["props"]["pageProps"]["data"]
 
         params = [
@@ -74,54 +71,26 @@ class STV(Config):
 
         return seasons
 
-    def account_config(self, drm: bool) -> tuple:
-        pkey = {
-            "Accept": "application/json;pk="
+    def account_config(self, drm: bool) -> Brightcove:
+        if drm:
+            return Brightcove(
+                self.client,
+                "6204867266001",
+                "BCpkADawqM1fQNUrQOvg-vTo4VGDTJ_lGjxp2zBSPcXJntYd5csQkjm7hBKviIVgfFoEJLW4_"
+                "JPPsHUwXNEjZspbr3d1HqGDw2gUqGCBZ_9Y_BF7HJsh2n6PQcpL9b2kdbi103oXvmTNZWiQ",
+                api=self.api,
+            )
+
+        return Brightcove(
+            self.client,
+            "1486976045",
             "BCpkADawqM1WJ12PwtUWqGXx3nbAo2XVSxyAQxPRZKBc75svhrUB9qIMPN_"
-            "d9US0Vib5smumeNMbntSmZIpzeVV1iUrnzYgf5k7UMaVN46PGYe_oSZ-xbPVnsm4"
-        }
-
-        pkey_drm = {
-            "Accept": "application/json;pk="
-            "BCpkADawqM1fQNUrQOvg-vTo4VGDTJ_lGjxp2zBSPcXJntYd5csQkjm7hBKviIVgfFoEJLW4_"
-            "JPPsHUwXNEjZspbr3d1HqGDw2gUqGCBZ_9Y_BF7HJsh2n6PQcpL9b2kdbi103oXvmTNZWiQ"
-        }
-
-        headers = pkey_drm if drm else pkey
-        account = "6204867266001" if drm else "1486976045"
-
-        return headers, account
-
-    def get_playlist(self, video_id: str):
-        lic_url = None
-        headers, account = self.account_config(self.drm)
-        url = f"{self.api}/{account}/videos/{video_id}"
-
-        r = self.client.get(url, headers=headers)
-        if not r.is_success:
-            print(f"\nError! {r.status_code}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
-
-        data = r.json()
-
-        manifest = [
-            source["src"]
-            for source in data["sources"]
-            if source.get("type") == "application/dash+xml"
-        ][0]
-
-        if self.drm:
-            key_systems = [
-                source
-                for source in data["sources"]
-                if source.get("type") == "application/dash+xml"
-                and source.get("key_systems").get("com.widevine.alpha")
-            ]
-
-            lic_url = key_systems[0]["key_systems"]["com.widevine.alpha"]["license_url"]
+            "d9US0Vib5smumeNMbntSmZIpzeVV1iUrnzYgf5k7UMaVN46PGYe_oSZ-xbPVnsm4",
+            api=self.api,
+        )
 
-        return manifest, lic_url
+    def get_playlist(self, video_id: str) -> tuple:
+        return self.brightcove.source(video_id, drm=self.drm)
 
     def get_series(self, data: list):
         return Series(
@@ -145,21 +114,9 @@ class STV(Config):
             ]
         )
 
-    def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        version = "3870737368"
-        system_id = "EDEF8BA979D64ACEA3C827DCD51D21ED"
-        data = "48E3DC959B06"
-        s = f"000000{version}00000000{system_id}000000181210{kid}{data}"
-        return base64.b64encode(bytes.fromhex(s)).decode()
-
     def get_mediainfo(self, manifest: str, quality: str) -> str:
         self.soup = BeautifulSoup(self.client.get(manifest), "xml")
-        pssh = self.get_pssh(self.soup) if self.drm else None
+        kids = default_kids(self.soup) if self.drm else None
         elements = self.soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
@@ -168,13 +125,13 @@ class STV(Config):
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, kids
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
                 info(f"Resolution not available. Getting closest match:")
-                return closest_match, pssh
+                return closest_match, kids
 
-        return heights[0], pssh
+        return heights[0], kids
 
     def get_content(self, url: str) -> object:
         with self.console.status("Fetching titles..."):
@@ -191,9 +148,7 @@ class STV(Config):
         return content, title
 
     def get_episode_from_url(self, url: str):
-        soup = BeautifulSoup(self.client.get(url), "html.parser")
-        props = soup.select_one("#__NEXT_DATA__").text
-        data = json.loads(props)
+        data = embedded_json(self.client, url, NEXT_DATA)
 
         episode_id = data["props"]["pageProps"]["episodeId"]
         content = data["props"]["initialReduxState"]["playerApiCache"][
@@ -247,21 +202,27 @@ class STV(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        self.brightcove = self.account_config(self.drm)
+        if len(downloads) > 1:
+            with self.console.status("Resolving videos..."):
+                self.brightcove.videos([stream.data for stream in downloads])
+
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             manifest, lic_url = self.get_playlist(stream.data)
-            res, pssh = self.get_mediainfo(manifest, self.quality)
+            res, kids = self.get_mediainfo(manifest, self.quality)
 
         keys = None
         if self.drm:
             with self.console.status("Getting decryption keys..."):
-                keys = (
-                    remote_cdm(pssh, lic_url, self.client)
-                    if self.remote
-                    else local_cdm(pssh, lic_url, self.client)
+                keys = get_keys(
+                    kids,
+                    lic_url,
+                    self.client,
+                    remote=self.remote,
+                    protection_scheme="cenc",
                 )
                 with open(self.tmp / "keys.txt", "w") as file:
                     file.write("\n".join(keys))
@@ -282,10 +243,7 @@ class STV(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
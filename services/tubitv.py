@@ -11,12 +11,8 @@ Some titles are encrypted, some are not. Both versions are supported
 
 """
 
-import base64
 import re
-import subprocess
 import json
-import shutil
-import sys
 
 from urllib.parse import urlparse
 from pathlib import Path
@@ -36,6 +32,9 @@ from utils.cdm import local_cdm, remote_cdm
 from utils.titles import Episode, Series, Movie, Movies
 from utils.args import Options, get_args
 from utils.config import Config
+from utils.retry import check, download_all, run_downloader
+from utils.pssh import hls_pssh, init_pssh
+from utils.subtitles.fetch import Subtitle
 
 
 class TUBITV(Config):
@@ -61,10 +60,7 @@ class TUBITV(Config):
         content = self.config["content"].format(content_id=content_id)
 
         r = self.client.get(f"{content}")
-        if not r.is_success:
-            print(f"\nError! {r.status_code}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
+        check(r, "Failed to fetch content")
 
         return r.json()
 
@@ -116,19 +112,12 @@ class TUBITV(Config):
 
     def get_pssh(self, mpd: str) -> str:
         r = self.client.get(mpd)
-        url = re.search('#EXT-X-MAP:URI="(.*?)"', r.text).group(1)
-
-        headers = {"Range": "bytes=0-9999"}
+        pssh = hls_pssh(r.text)
+        if pssh:
+            return pssh
 
-        response = self.client.get(url, headers=headers)
-        with open(self.tmp / "init.mp4", "wb") as f:
-            f.write(response.read())
-
-        raw = Path(self.tmp / "init.mp4").read_bytes()
-        wv = raw.rfind(bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed"))
-        if wv == -1:
-            return None
-        return base64.b64encode(raw[wv - 12 : wv - 12 + raw[wv - 9]]).decode("utf-8")
+        url = re.search('#EXT-X-MAP:URI="(.*?)"', r.text).group(1)
+        return init_pssh(self.client, url)
 
     def get_mediainfo(self, manifest: str, quality: str) -> str:
         m3u8 = self.client.get(manifest).text
@@ -241,10 +230,13 @@ class TUBITV(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
+        subtitle = (
+            Subtitle(self.client, stream.subtitle, self.tmp) if stream.subtitle else None
+        )
+
         with self.console.status("Getting media info..."):
             manifest, res = self.get_mediainfo(stream.data, self.quality)
 
@@ -264,25 +256,20 @@ class TUBITV(Config):
         self.save_path = set_save_path(stream, self.config, title)
         self.manifest = stream.data
         self.key_file = self.tmp / "keys.txt" if stream.lic_url else None
-        self.sub_path = None
-
-        if stream.subtitle is not None:
-            self.sub_path = self.save_path / f"{self.filename}.srt"
-            r = self.client.get(url=f"{stream.subtitle}")
-            with open(self.sub_path, "wb") as f:
-                f.write(r.content)
+        self.sub_path = subtitle.result(self) if subtitle else None
 
         info(f"{str(stream)}")
         info(f"{keys[0]}") if stream.lic_url else None
         click.echo("")
 
+        if self.sub_only and self.sub_path:
+            info(f"Subtitles saved to {self.sub_path}\n")
+            return
+
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
@@ -8,10 +8,6 @@ Quality: 1080p, AAC 2.0 max
 
 """
 
-import base64
-import shutil
-import subprocess
-import sys
 import re
 
 from urllib.parse import urlparse
@@ -30,10 +26,13 @@ from utils.utilities import (
     print_info,
     set_filename,
 )
-from utils.cdm import local_cdm, remote_cdm
+from utils.cdm import get_keys
 from utils.titles import Episode, Series
 from utils.args import Options, get_args
+from utils.brightcove import Brightcove
 from utils.config import Config
+from utils.retry import download_all, run_downloader
+from utils.pssh import default_kids
 
 
 class UKTVPLAY(Config):
@@ -47,6 +46,13 @@ class UKTVPLAY(Config):
 
         self.vod = self.config["vod"]
         self.api = self.config["api"]
+        self.brightcove = Brightcove(
+            self.client,
+            "1242911124001",
+            "BCpkADawqM3vt2DxMZ94FyjAfheKk_-e92F-hnuKgoJMh2hgaASJJV_gUeYm710md2yS24_"
+            "4PfOEbF_SSTNM4PijWNnwZG8Tlg4Y40XyFQh_T9Vq2460u3GXCUoSQOYlpfhbzmQ8lEwUmmte",
+            api=self.api,
+        )
 
         self.get_options()
 
@@ -84,51 +90,11 @@ class UKTVPLAY(Config):
         )
 
     def get_playlist(self, video_id: str) -> tuple:
-        account = "1242911124001"
-        headers = {
-            "Accept": "application/json;pk="
-            "BCpkADawqM3vt2DxMZ94FyjAfheKk_-e92F-hnuKgoJMh2hgaASJJV_gUeYm710md2yS24_"
-            "4PfOEbF_SSTNM4PijWNnwZG8Tlg4Y40XyFQh_T9Vq2460u3GXCUoSQOYlpfhbzmQ8lEwUmmte"
-        }
-        url = f"{self.api}{account}/videos/{video_id}"
-
-        r = self.client.get(url, headers=headers)
-        if not r.is_success:
-            print(f"\nError! {r.status_code}")
-            shutil.rmtree(self.tmp)
-            sys.exit(1)
-
-        data = r.json()
-
-        manifest = [
-            x["src"]
-            for x in data["sources"]
-            if x.get("key_systems").get("com.widevine.alpha")
-        ][0]
-
-        lic_url = [
-            x["key_systems"]["com.widevine.alpha"]["license_url"]
-            for x in data["sources"]
-            if x.get("key_systems").get("com.widevine.alpha")
-        ][0]
-
-        return manifest, lic_url
-
-    def get_pssh(self, soup: str) -> str:
-        kid = (
-            soup.select_one("ContentProtection")
-            .attrs.get("cenc:default_KID")
-            .replace("-", "")
-        )
-        version = "3870737368"
-        system_id = "EDEF8BA979D64ACEA3C827DCD51D21ED"
-        data = "48E3DC959B06"
-        s = f"000000{version}00000000{system_id}000000181210{kid}{data}"
-        return base64.b64encode(bytes.fromhex(s)).decode()
+        return self.brightcove.source(video_id)
 
     def get_mediainfo(self, manifest: str, quality: str) -> str:
         self.soup = BeautifulSoup(self.client.get(manifest), "xml")
-        pssh = self.get_pssh(self.soup)
+        kids = default_kids(self.soup)
         elements = self.soup.find_all("Representation")
         heights = sorted(
             [int(x.attrs["height"]) for x in elements if x.attrs.get("height")],
@@ -137,13 +103,13 @@ class UKTVPLAY(Config):
 
         if quality is not None:
             if int(quality) in heights:
-                return quality, pssh
+                return quality, kids
             else:
                 closest_match = min(heights, key=lambda x: abs(int(x) - int(quality)))
                 info(f"Resolution not available. Getting closest match:")
-                return closest_match, pssh
+                return closest_match, kids
 
-        return heights[0], pssh
+        return heights[0], kids
     
     def get_content(self, url: str) -> object:
         if self.movie:
@@ -220,19 +186,20 @@ class UKTVPLAY(Config):
             if self.titles:
                 opt.list_titles(content)
 
-        for download in downloads:
-            self.download(download, title)
+        if len(downloads) > 1:
+            with self.console.status("Resolving videos..."):
+                self.brightcove.videos([stream.data for stream in downloads])
+
+        download_all(downloads, lambda stream: self.download(stream, title))
 
     def download(self, stream: object, title: str) -> None:
         with self.console.status("Getting media info..."):
             manifest, lic_url = self.get_playlist(stream.data)
-            res, pssh = self.get_mediainfo(manifest, self.quality)
+            res, kids = self.get_mediainfo(manifest, self.quality)
 
         with self.console.status("Getting decryption keys..."):
-            keys = (
-                remote_cdm(pssh, lic_url, self.client)
-                if self.remote
-                else local_cdm(pssh, lic_url, self.client)
+            keys = get_keys(
+                kids, lic_url, self.client, remote=self.remote, protection_scheme="cenc"
             )
             with open(self.tmp / "keys.txt", "w") as file:
                 file.write("\n".join(keys))
@@ -254,10 +221,7 @@ class UKTVPLAY(Config):
         args, file_path = get_args(self, res)
 
         if not file_path.exists():
-            try:
-                subprocess.run(args, check=True)
-            except:
-                raise ValueError("Download failed or was interrupted")
+            run_downloader(args)
         else:
             info(f"{self.filename} already exist. Skipping download\n")
             self.sub_path.unlink() if self.sub_path else None
@@ -0,0 +1,97 @@
+"""
+utils.pssh against boxes produced by the code it replaced
+
+C4, C5 and Pluto built a v0 box around one KID with a bytearray; ITV and UKTV
+Play appended the cenc protection scheme as hardcoded hex; Roku used a fixed
+box with a "*" content ID
+"""
+
+import base64
+import struct
+
+import httpx
+
+from bs4 import BeautifulSoup
+
+from utils.pssh import build_pssh, default_kids, init_pssh, mpd_pssh, pssh_kids
+
+KID = "01234567-89ab-cdef-0123-456789abcdef"
+KID2 = "fedcba9876543210fedcba9876543210"
+
+BYTEARRAY_BOX = "AAAAMnBzc2gAAAAA7e+LqXnWSs6jyCfc1R0h7QAAABISEAEjRWeJq83vASNFZ4mrze8="
+CENC_BOX = (
+    "AAAAOHBzc2gAAAAA7e+LqXnWSs6jyCfc1R0h7QAAABgSEAEjRWeJq83vASNFZ4mrze9I49yVmwY="
+)
+ROKU_BOX = "AAAAKXBzc2gAAAAA7e+LqXnWSs6jyCfc1R0h7QAAAAkiASpI49yVmwY="
+
+MPD = f"""<?xml version="1.0"?>
+<MPD xmlns:cenc="urn:mpeg:cenc:2013">
+  <Period>
+    <AdaptationSet>
+      <ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011"
+        cenc:default_KID="{KID.upper()}"/>
+      <ContentProtection schemeIdUri="urn:uuid:edef8ba9-79d6-4ace-a3c8-27dcd51d21ed"/>
+    </AdaptationSet>
+    <AdaptationSet>
+      <ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011"
+        cenc:default_KID="{KID}"/>
+    </AdaptationSet>
+    <AdaptationSet>
+      <ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011"
+        cenc:default_KID="{KID2}"/>
+    </AdaptationSet>
+  </Period>
+</MPD>"""
+
+
+def box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def test_bytearray_services():
+    assert build_pssh(KID) == BYTEARRAY_BOX
+    assert build_pssh(KID.replace("-", "")) == BYTEARRAY_BOX
+    assert build_pssh(bytes.fromhex(KID.replace("-", ""))) == BYTEARRAY_BOX
+
+
+def test_itv():
+    assert build_pssh(KID, protection_scheme="cenc") == CENC_BOX
+
+
+def test_roku():
+    assert build_pssh(content_id=b"*", protection_scheme="cenc") == ROKU_BOX
+
+
+def test_v1_multi_kid_round_trip():
+    pssh = build_pssh(KID, KID2, version=1)
+    data = base64.b64decode(pssh)
+
+    assert data[8] == 1
+    assert struct.unpack_from(">I", data, 28) == (2,)
+    assert pssh_kids(pssh) == [KID.replace("-", ""), KID2]
+
+
+def test_v0_multi_kid():
+    assert pssh_kids(build_pssh(KID, KID2)) == [KID.replace("-", ""), KID2]
+
+
+def test_default_kids():
+    soup = BeautifulSoup(MPD, "xml")
+    assert default_kids(soup) == [KID.replace("-", ""), KID2]
+    assert mpd_pssh(soup) == BYTEARRAY_BOX
+
+
+def test_init_pssh():
+    pssh = base64.b64decode(CENC_BOX)
+    init = box(b"ftyp", b"isom" * 4) + box(b"moov", box(b"mvhd", b"\0" * 100) + pssh)
+    segment = init + box(b"mdat", b"\0" * 100000)
+    ranges = []
+
+    def handler(request):
+        start, end = request.headers["Range"][6:].split("-")
+        ranges.append((int(start), int(end)))
+        return httpx.Response(206, content=segment[int(start) : int(end) + 1])
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    assert init_pssh(client, "https://example.com/init.mp4") == CENC_BOX
+    assert all(start < len(init) for start, _ in ranges)
@@ -2,7 +2,8 @@ import shutil
 
 from pathlib import Path
 
-from utils.utilities import info, set_range
+from utils.utilities import info, parse_episode, parse_range, parse_season
+from utils.output import write_records
 
 
 class Options:
@@ -12,65 +13,78 @@ class Options:
         self.titles = cls.titles
         self.url = cls.url
         self.tmp = cls.tmp
+        self.output = cls.output
 
-    def list_titles(self, series: object) -> str:
-        for episode in series:
-            info(str(episode))
+    def print_titles(self, titles: list) -> None:
+        if self.output:
+            write_records((title.to_dict() for title in titles), self.output)
+        else:
+            for title in titles:
+                info(str(title))
 
-        shutil.rmtree(self.tmp)
         exit(0)
 
+    def list_titles(self, series: object) -> str:
+        self.print_titles(series)
+
+    def find_episode(self, series: object, selector: str) -> object:
+        query = parse_episode(selector)
+        if query is not None and query[1] is not None:
+            return series.get(*query)
+
+        key = selector.strip().lower()
+        return next((i for i, k in zip(series, series.keys()) if key in k), None)
+
+    def find_episodes(self, series: object, selector: str) -> list:
+        """Every episode a selector matches: one episode, a whole season or a name"""
+        query = parse_episode(selector)
+        if query is not None and query[1] is None:
+            return series.get_season(query[0])
+        if query is not None:
+            episode = series.get(*query)
+            return [episode] if episode is not None else []
+
+        key = selector.strip().lower()
+        return [i for i, k in zip(series, series.keys()) if key in k]
+
     def get_episode(self, series: object) -> None:
-        if "-" in self.episode:
+        if "-" in self.episode and parse_range(self.episode):
             return self.get_episode_range(series, self.episode)
         if "," in self.episode:
             return self.get_episode_mix(series, self.episode)
 
-        episode = next((i for i in series if self.episode.lower() in str(i).lower()), None)
+        episode = self.find_episode(series, self.episode)
 
         if episode is not None and self.titles:
-            info(f"{str(episode)}")
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles([episode])
 
         if episode is not None:
             return [episode]
         else:
             info(f"{self.episode} was not found")
-            shutil.rmtree(self.tmp)
             exit(0)
 
     def get_episode_range(self, series: object, episodes: str) -> None:
-        episode_range = set_range(episodes)
+        start, end = parse_range(episodes)
 
-        downloads = []
-        for episode in series:
-            if any(i.lower() in str(episode).lower() for i in episode_range):
-                downloads.append(episode)
+        downloads = series.get_range(start, end)
 
         if self.titles:
-            for episode in downloads:
-                info(f"{str(episode)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
     def get_episode_mix(self, series: object, episodes: str) -> None:
-        episode_mix = [x for x in episodes.split(",")]
+        episode_mix = [
+            episode
+            for selector in episodes.split(",")
+            for episode in self.find_episodes(series, selector)
+        ]
 
-        downloads = []
-        for episode in series:
-            if any(i.lower() in str(episode).lower() for i in episode_mix):
-                downloads.append(episode)
+        downloads = sorted({id(x): x for x in episode_mix}.values(), key=series.key)
 
         if self.titles:
-            for episode in downloads:
-                info(f"{str(episode)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
@@ -78,34 +92,25 @@ class Options:
         if "," in self.season:
             return self.get_season_mix(series, self.season)
 
-        downloads = []
-        for episode in series:
-            if self.season in str(episode):
-                downloads.append(episode)
+        season = parse_season(self.season)
+        downloads = series.get_season(season) if season is not None else []
 
         if self.titles:
-            for episode in downloads:
-                info(f"{str(episode)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
     def get_season_mix(self, series: object, seasons: str):
-        season_mix = [x for x in seasons.split(",")]
+        season_mix = sorted(
+            {parse_season(x) for x in seasons.split(",")} - {None}
+        )
 
-        downloads = []
-        for episode in series:
-            if any(i in str(episode) for i in season_mix):
-                downloads.append(episode)
+        downloads = [
+            episode for season in season_mix for episode in series.get_season(season)
+        ]
 
         if self.titles:
-            for episode in downloads:
-                info(f"{str(episode)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
@@ -116,11 +121,7 @@ class Options:
             downloads.append(episode)
 
         if self.titles:
-            for episode in downloads:
-                info(f"{str(episode)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
@@ -131,11 +132,7 @@ class Options:
             downloads.append(movie)
 
         if self.titles:
-            for movie in downloads:
-                info(f"{str(movie)}")
-
-            shutil.rmtree(self.tmp)
-            exit(0)
+            self.print_titles(downloads)
 
         return downloads
 
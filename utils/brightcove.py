@@ -0,0 +1,167 @@
+"""
+Brightcove Playback API
+
+STV and UKTV Play host their videos on Brightcove. Video responses are cached
+by account and video id until the signed source URLs in them expire, so a
+season resolved with one search request serves each episode without another
+lookup. Accounts whose policy key doesn't allow search fall back to fetching
+the videos concurrently
+"""
+
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlparse
+
+import httpx
+
+from utils.cache import TTLCache, token_expiry
+from utils.retry import check, RequestError
+
+API = "https://edge.api.brightcove.com/playback/v1/accounts"
+DASH = "application/dash+xml"
+WIDEVINE = "com.widevine.alpha"
+
+BATCH = 20
+EXPIRY_PARAMS = ("expires", "exp", "expiry", "Expires")
+
+_cache = TTLCache(ttl=600)
+
+
+def _url_expiry(url: str) -> float:
+    for name, value in parse_qsl(urlparse(url).query):
+        if name in EXPIRY_PARAMS and value.isdigit():
+            return float(value)
+        expiry = token_expiry(value) if value.count(".") == 2 else None
+        if expiry:
+            return expiry
+    return None
+
+
+def expiry(video: dict, default: float) -> float:
+    """When the earliest signed source URL in video stops working"""
+    times = [
+        _url_expiry(source.get("src", "")) for source in video.get("sources", [])
+    ]
+    times = [t for t in times if t]
+    return min(times) - 60 if times else time.time() + default
+
+
+def dash_source(video: dict, drm: bool = True) -> tuple:
+    """
+    Manifest and Widevine licence URL of a video, in one pass over its sources
+
+    The licence URL is None when drm is False. Raises RequestError if there
+    is no suitable DASH source
+    """
+    manifest = None
+    for source in video.get("sources", []):
+        if source.get("type") != DASH or not source.get("src"):
+            continue
+        widevine = (source.get("key_systems") or {}).get(WIDEVINE)
+        if not drm:
+            return source["src"], None
+        if widevine and widevine.get("license_url"):
+            return source["src"], widevine["license_url"]
+        manifest = manifest or source["src"]
+
+    if manifest:
+        raise RequestError(f"No Widevine licence for video {video.get('id')}")
+    raise RequestError(f"No DASH source for video {video.get('id')}")
+
+
+class Brightcove:
+    def __init__(
+        self,
+        client: httpx.Client,
+        account: str,
+        policy_key: str,
+        api: str = API,
+        ttl: float = 600,
+    ) -> None:
+        self.client = client
+        self.account = account
+        self.headers = {"Accept": f"application/json;pk={policy_key}"}
+        self.api = f"{api.rstrip('/')}/{account}"
+        self.ttl = ttl
+        self.search = True
+
+    def _store(self, video: dict) -> dict:
+        return _cache.set(
+            [self.account, str(video["id"])],
+            video,
+            expires=expiry(video, self.ttl),
+        )
+
+    def _get(self, path: str, params: dict = None) -> httpx.Response:
+        return self.client.get(f"{self.api}{path}", headers=self.headers, params=params)
+
+    def video(self, video_id: str) -> dict:
+        video = _cache.get([self.account, str(video_id)])
+        if video is not None:
+            return video
+
+        r = self._get(f"/videos/{video_id}")
+        check(r, "Failed to fetch playlist")
+        return self._store(r.json())
+
+    def _search(self, video_ids: list) -> list:
+        query = " ".join(f"id:{video_id}" for video_id in video_ids)
+        r = self._get("/videos", params={"q": query, "limit": len(video_ids)})
+        if r.status_code in (400, 401, 403):
+            self.search = False
+            return []
+        check(r, "Failed to search videos")
+        return r.json().get("videos", [])
+
+    def _fetch(self, video_id: str) -> dict:
+        try:
+            return self.video(video_id)
+        except (RequestError, httpx.HTTPError, ValueError):
+            return None
+
+    def videos(self, video_ids: list) -> dict:
+        """
+        Videos by id, resolved together
+
+        Cached videos are used as they are, the rest are looked up with the
+        search endpoint in batches and anything it didn't return is fetched
+        one by one. Videos that can't be fetched are left out, so each
+        episode reports its own error when it's downloaded
+        """
+        video_ids = list(dict.fromkeys(str(video_id) for video_id in video_ids))
+        videos = {}
+        for video_id in video_ids:
+            video = _cache.get([self.account, video_id])
+            if video is not None:
+                videos[video_id] = video
+
+        pending = [video_id for video_id in video_ids if video_id not in videos]
+        for i in range(0, len(pending), BATCH):
+            if not self.search or len(pending) < 2:
+                break
+            try:
+                found = self._search(pending[i : i + BATCH])
+            except (RequestError, httpx.HTTPError, ValueError):
+                found = []
+            for video in found:
+                videos[str(video["id"])] = self._store(video)
+
+        pending = [video_id for video_id in pending if video_id not in videos]
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(len(pending), 4)) as pool:
+                for video_id, video in zip(pending, pool.map(self._fetch, pending)):
+                    if video is not None:
+                        videos[video_id] = video
+
+        return videos
+
+    def playlist(self, playlist_id: str) -> list:
+        """Every video in a Brightcove playlist, cached individually"""
+        r = self._get(f"/playlists/{playlist_id}")
+        check(r, "Failed to fetch playlist")
+        return [self._store(video) for video in r.json().get("videos", [])]
+
+    def source(self, video_id: str, drm: bool = True) -> tuple:
+        """Manifest and licence URL for video_id"""
+        return dash_source(self.video(video_id), drm=drm)
@@ -0,0 +1,113 @@
+"""
+Expiring caches
+
+TTLCache keeps values in memory until they expire. Named caches are also
+written to a JSON file in cache_dir, so sessions, tokens and resolved URLs
+survive between runs. Values have to be JSON serialisable for that. Tokens
+and keys end up in these files, so they're only readable by their owner.
+
+get_or_set runs the factory once per key even when several threads ask for
+the same missing value at the same time
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Callable
+
+_directory = Path("cache")
+
+
+def configure(directory: str = None) -> None:
+    """Set where named caches are stored, from cache_dir in config.yaml"""
+    global _directory
+    _directory = Path(directory or "cache")
+
+
+def token_expiry(token: str, default: float = None) -> float:
+    """Expiry time of a JWT from its exp claim, without verifying it"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return default
+
+
+def _key(key: Any) -> str:
+    return key if isinstance(key, str) else json.dumps(key, sort_keys=True)
+
+
+class TTLCache:
+    def __init__(self, name: str = None, ttl: float = 3600) -> None:
+        self.ttl = ttl
+        self.path = _directory / f"{name}.json" if name else None
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.pending = {}
+
+        if self.path and self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except ValueError:
+                self.entries = {}
+            self._expire()
+
+    def _expire(self) -> None:
+        now = time.time()
+        self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        temp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(self.entries))
+        os.chmod(temp, 0o600)
+        os.replace(temp, self.path)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(_key(key))
+            if entry and entry[0] > time.time():
+                return entry[1]
+            return default
+
+    def set(self, key: Any, value: Any, ttl: float = None, expires: float = None) -> Any:
+        """Store value until expires, or for ttl seconds"""
+        if expires is None:
+            expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._expire()
+            self.entries[_key(key)] = (expires, value)
+            self._save()
+        return value
+
+    def pop(self, key: Any) -> None:
+        with self.lock:
+            if self.entries.pop(_key(key), None) is not None:
+                self._save()
+
+    def get_or_set(self, key: Any, factory: Callable, ttl: float = None) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        with self.lock:
+            lock = self.pending.setdefault(_key(key), threading.Lock())
+
+        with lock:
+            value = self.get(key, missing)
+            if value is missing:
+                value = self.set(key, factory(), ttl=ttl)
+
+        with self.lock:
+            self.pending.pop(_key(key), None)
+        return value
@@ -1,44 +1,388 @@
+"""
+CDM backends
+
+Every backend turns a PSSH into a licence challenge and a licence into
+"kid:key" strings. The licence request itself goes through utils.license on
+the service's client, so cookies, headers and proxies stay with the service
+
+- local: pywidevine L3 device in /pywidevine
+- serve: remote CDM speaking the pywidevine-serve JSON API
+- wvclone: remote CDM that also makes the licence request (legacy, only
+  used when its host and password are configured)
+- mock: fake keys derived from the KIDs, for offline testing
+
+Backends are set in config.yaml and created once per run
+"""
+
 import base64
+import hashlib
+import io
+import json
+import threading
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import httpx
+import yaml
 
 from bs4 import BeautifulSoup
 
-from pywidevine.L3.decrypt.wvdecryptcustom import WvDecrypt
-from pywidevine.L3.cdm import deviceconfig
-
-def local_cdm(pssh: str, lic_url: str, client, cert_b64=None) -> str:
-    wvdecrypt = WvDecrypt(
-        init_data_b64=pssh,
-        cert_data_b64=cert_b64,
-        device=deviceconfig.device_android_generic,
-    )
-
-    response = client.post(url=lic_url, data=wvdecrypt.get_challenge())
-    license_b64 = base64.b64encode(response.content)
-    wvdecrypt.update_license(license_b64)
-    status, content = wvdecrypt.start_process()
-
-    if status:
-        return content
-    else:
-        raise ValueError("Unable to fetch decryption keys")
-
-
-def remote_cdm(pssh: str, lic_url: str, client) -> str:
-    headers = {
-        "accept": "application/json, text/plain, */*",
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
-            (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
-    }
-    payload = {
-        "password": "password",
-        "license": lic_url,
-        "headers": "connection: keep-alive",
-        "pssh": pssh,
-        "buildInfo": "",
-        "proxy": "",
-        "cache": False,
-    }
-    response = client.post("https://wvclone.fly.dev/wv", headers=headers, json=payload)
-    soup = BeautifulSoup(response.text, "html.parser")
-    li_tags = soup.find("ol").find_all("li")
-    return [x.text for x in li_tags]
+from utils.license import Codec, LicenceClient, LicenceError
+from utils.pssh import build_pssh, pssh_kids
+
+LICENCE_ERRORS = (LicenceError, httpx.HTTPError)
+
+SETTINGS = {
+    "local": "local",
+    "remote": "serve",
+    "serve": {
+        "host": "http://127.0.0.1:8786",
+        "device": "android_generic",
+        "secret": "",
+    },
+    "wvclone": {
+        "host": "",
+        "password": "",
+    },
+}
+
+
+class CDM:
+    """Base backend: open a session, build a challenge, parse the licence"""
+
+    def open(self, pssh: str, cert_b64: str = None) -> str:
+        raise NotImplementedError
+
+    def challenge(self, session: str) -> bytes:
+        raise NotImplementedError
+
+    def parse(self, session: str, licence: bytes) -> list:
+        raise NotImplementedError
+
+    def close(self, session: str) -> None:
+        pass
+
+    def get_keys(
+        self, pssh: str, lic_url: str, client, cert_b64: str = None, codec=None
+    ) -> list:
+        session = self.open(pssh, cert_b64)
+        try:
+            licence = LicenceClient(client, codec).post(lic_url, self.challenge(session))
+            keys = self.parse(session, licence)
+        finally:
+            self.close(session)
+
+        if not keys:
+            raise LicenceError("Licence contained no content keys")
+
+        return keys
+
+
+@lru_cache(maxsize=None)
+def device_file(path: str) -> bytes:
+    """Contents of a device blob or key, read from disk once per path"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _device_open(file, mode: str = "r", *args, **kwargs):
+    if any(flag in mode for flag in "wax+"):
+        return open(file, mode, *args, **kwargs)
+    data = device_file(str(file))
+    return io.BytesIO(data) if "b" in mode else io.StringIO(data.decode())
+
+
+class LocalCDM(CDM):
+    """
+    pywidevine L3 device
+
+    The device config and Cdm are created once and shared by every session
+    instead of being rebuilt for each licence. The L3 Cdm opens the client ID
+    blob and private key itself on every challenge and licence; while it runs
+    under the lock, its module sees an open() that serves them from
+    device_file(), and the builtin is back as soon as the call returns
+    """
+
+    def __init__(self) -> None:
+        from pywidevine.L3.cdm import cdm, deviceconfig
+
+        self.module = cdm
+        self.cdm = cdm.Cdm()
+        self.device = deviceconfig.DeviceConfig(deviceconfig.device_android_generic)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def device_files(self):
+        with self.lock:
+            self.module.open = _device_open
+            try:
+                yield
+            finally:
+                del self.module.open
+
+    def open(self, pssh: str, cert_b64: str = None) -> str:
+        with self.device_files():
+            session = self.cdm.open_session(pssh, self.device)
+            if cert_b64:
+                self.cdm.set_service_certificate(session, cert_b64)
+        return session
+
+    def challenge(self, session: str) -> bytes:
+        with self.device_files():
+            return self.cdm.get_license_request(session)
+
+    def parse(self, session: str, licence: bytes) -> list:
+        with self.device_files():
+            self.cdm.provide_license(session, base64.b64encode(licence))
+            keys = self.cdm.get_keys(session)
+        return [
+            f"{key.kid.hex()}:{key.key.hex()}" for key in keys if key.type == "CONTENT"
+        ]
+
+    def close(self, session: str) -> None:
+        with self.lock:
+            self.cdm.close_session(session)
+
+
+class ServeCDM(CDM):
+    """Remote CDM with a pywidevine-serve compatible JSON API, on one persistent client"""
+
+    def __init__(self, host: str, device: str, secret: str = "") -> None:
+        self.device = device
+        self.sessions = {}
+        self.client = httpx.Client(
+            base_url=host.rstrip("/"),
+            headers={"X-Secret-Key": secret or ""},
+            timeout=20.0,
+        )
+
+    def _call(self, method: str, path: str, **payload) -> dict:
+        r = self.client.request(method, f"/{self.device}/{path}", json=payload or None)
+        data = r.json()
+        if r.status_code != 200:
+            raise LicenceError(f"Remote CDM error: {data.get('message', r.status_code)}")
+        return data.get("data") or {}
+
+    def open(self, pssh: str, cert_b64: str = None) -> str:
+        session = self._call("GET", "open")["session_id"]
+        if cert_b64:
+            self._call(
+                "POST",
+                "set_service_certificate",
+                session_id=session,
+                certificate=cert_b64,
+            )
+        self.sessions[session] = pssh
+        return session
+
+    def challenge(self, session: str) -> bytes:
+        data = self._call(
+            "POST",
+            "get_license_challenge/STREAMING",
+            session_id=session,
+            init_data=self.sessions[session],
+        )
+        return base64.b64decode(data["challenge_b64"])
+
+    def parse(self, session: str, licence: bytes) -> list:
+        self._call(
+            "POST",
+            "parse_license",
+            session_id=session,
+            license_message=base64.b64encode(licence).decode(),
+        )
+        keys = self._call("POST", "get_keys/CONTENT", session_id=session)["keys"]
+        return [f"{key['key_id']}:{key['key']}" for key in keys]
+
+    def close(self, session: str) -> None:
+        self.sessions.pop(session, None)
+        try:
+            self._call("GET", f"close/{session}")
+        except Exception:
+            pass
+
+
+class WVCloneCDM(CDM):
+    """
+    Remote service that requests the licence itself and returns an HTML key list
+
+    Only a plain Codec can be honoured: its headers are forwarded with the
+    request. Codecs that wrap the challenge are refused
+    """
+
+    def __init__(self, host: str, password: str) -> None:
+        self.host = host
+        self.password = password
+
+    def get_keys(
+        self, pssh: str, lic_url: str, client, cert_b64: str = None, codec=None
+    ) -> list:
+        if codec is not None and type(codec) is not Codec:
+            raise LicenceError(
+                f"The wvclone backend can't send {type(codec).__name__} licence "
+                "requests; use the local or serve backend"
+            )
+        licence_headers = {"connection": "keep-alive"}
+        licence_headers.update(codec.headers if codec else {})
+
+        headers = {
+            "accept": "application/json, text/plain, */*",
+            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
+                (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+        }
+        payload = {
+            "password": self.password,
+            "license": lic_url,
+            "headers": "\n".join(f"{k}: {v}" for k, v in licence_headers.items()),
+            "pssh": pssh,
+            "buildInfo": "",
+            "proxy": "",
+            "cache": False,
+        }
+        response = client.post(self.host, headers=headers, json=payload)
+        soup = BeautifulSoup(response.text, "html.parser")
+        keys = soup.find("ol")
+        if keys is None:
+            raise LicenceError(f"Remote CDM error: {response.status_code}")
+        return [x.text for x in keys.find_all("li")]
+
+
+class MockCDM(CDM):
+    """
+    Fake CDM for offline testing
+
+    The challenge lists the KIDs of the PSSH and mock_licence() answers it with
+    keys derived from them, so every step of a real licence round-trip runs
+    """
+
+    def __init__(self) -> None:
+        self.sessions = {}
+
+    def open(self, pssh: str, cert_b64: str = None) -> str:
+        session = uuid.uuid4().hex
+        self.sessions[session] = pssh_kids(pssh)
+        return session
+
+    def challenge(self, session: str) -> bytes:
+        return json.dumps({"kids": self.sessions[session]}).encode()
+
+    def parse(self, session: str, licence: bytes) -> list:
+        keys = json.loads(licence)["keys"]
+        return [f"{key['kid']}:{key['key']}" for key in keys]
+
+    def close(self, session: str) -> None:
+        self.sessions.pop(session, None)
+
+
+def mock_key(kid: str) -> str:
+    return hashlib.md5(bytes.fromhex(kid)).hexdigest()
+
+
+def mock_licence(challenge: bytes) -> bytes:
+    """Licence server side of MockCDM"""
+    kids = json.loads(challenge)["kids"]
+    return json.dumps({"keys": [{"kid": x, "key": mock_key(x)} for x in kids]}).encode()
+
+
+@lru_cache(maxsize=1)
+def settings() -> dict:
+    """The cdm section of config.yaml, merged over the defaults"""
+    try:
+        with open(Path("config.yaml"), "r") as f:
+            config = yaml.safe_load(f).get("cdm") or {}
+    except (FileNotFoundError, AttributeError):
+        config = {}
+
+    merged = {**SETTINGS, **config}
+    for name in ("serve", "wvclone"):
+        merged[name] = {**SETTINGS[name], **(config.get(name) or {})}
+    return merged
+
+
+_backends = {}
+_lock = threading.Lock()
+
+
+def get_cdm(name: str) -> CDM:
+    """Shared backend instance by name: local, serve, wvclone or mock"""
+    with _lock:
+        if name not in _backends:
+            config = settings()
+            if name == "local":
+                _backends[name] = LocalCDM()
+            elif name == "serve":
+                _backends[name] = ServeCDM(**config["serve"])
+            elif name == "wvclone":
+                if not config["wvclone"]["host"]:
+                    raise ValueError("Set cdm.wvclone.host in config.yaml to use wvclone")
+                _backends[name] = WVCloneCDM(**config["wvclone"])
+            elif name == "mock":
+                _backends[name] = MockCDM()
+            else:
+                raise ValueError(f"Unknown CDM backend: {name}")
+
+        return _backends[name]
+
+
+def local_cdm(pssh: str, lic_url: str, client, cert_b64=None, codec=None) -> list:
+    cdm = get_cdm(settings()["local"])
+    return cdm.get_keys(pssh, lic_url, client, cert_b64, codec)
+
+
+def remote_cdm(pssh: str, lic_url: str, client, codec=None) -> list:
+    return get_cdm(settings()["remote"]).get_keys(pssh, lic_url, client, codec=codec)
+
+
+def _licence(pssh: str, lic_url: str, client, remote: bool, codec) -> list:
+    if remote:
+        return remote_cdm(pssh, lic_url, client, codec)
+    return local_cdm(pssh, lic_url, client, codec=codec)
+
+
+def get_keys(
+    kids: list, lic_url: str, client, remote: bool = False, codec=None, **options
+) -> list:
+    """
+    Content keys for every KID of an asset
+
+    All KIDs go into a single challenge first. KIDs the licence server leaves
+    out, or every KID if it rejects the combined request, are then licensed
+    one per request, concurrently. The codec is passed to the licence client,
+    any other options to build_pssh
+    """
+    kids = list(dict.fromkeys(kid.replace("-", "").lower() for kid in kids))
+    if not kids:
+        raise ValueError("No key IDs found in manifest")
+
+    if len(kids) == 1:
+        return _licence(build_pssh(kids[0], **options), lic_url, client, remote, codec)
+
+    keys, missing, errors = [], kids, []
+    try:
+        keys = _licence(build_pssh(*kids, **options), lic_url, client, remote, codec)
+        found = {key.split(":")[0].replace("-", "").lower() for key in keys}
+        missing = [kid for kid in kids if kid not in found]
+    except LICENCE_ERRORS as e:
+        errors.append(e)
+
+    def single(kid: str) -> list:
+        try:
+            return _licence(build_pssh(kid, **options), lic_url, client, remote, codec)
+        except LICENCE_ERRORS as e:
+            errors.append(e)
+            return []
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), 8)) as pool:
+            for result in pool.map(single, missing):
+                keys.extend(result)
+
+    if not keys:
+        last = errors[-1] if errors else None
+        raise ValueError(f"Unable to fetch decryption keys: {last}") from last
+
+    return list(dict.fromkeys(keys))
@@ -0,0 +1,166 @@
+"""
+Local stand-in for a remote CDM
+
+Speaks the same pywidevine-serve JSON API as ServeCDM and also answers
+licence requests on /license, so the remote path can be run and load-tested
+without a device or a licence server:
+
+    python -m utils.cdm_server --delay 0.05
+
+Then set "remote: serve" in config.yaml and point the licence URL at
+http://127.0.0.1:8786/license
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import click
+
+from utils.cdm import mock_key, mock_licence, settings
+from utils.pssh import pssh_kids
+
+ROUTE = re.compile(r"^/(?P<device>[^/]+)/(?P<action>[a-z_]+)(?:/(?P<arg>[^/]+))?$")
+
+
+class Sessions:
+    def __init__(self) -> None:
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def open(self) -> str:
+        session = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session] = {"kids": [], "keys": []}
+        return session
+
+    def get(self, session: str) -> dict:
+        with self.lock:
+            return self.sessions[session]
+
+    def close(self, session: str) -> None:
+        with self.lock:
+            self.sessions.pop(session, None)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    secret = ""
+    delay = 0.0
+    sessions = Sessions()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def reply(self, status: int, body: bytes, content_type="application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def result(self, status: int, message: str, data: dict = None) -> None:
+        body = {"status": status, "message": message}
+        if data is not None:
+            body["data"] = data
+        self.reply(status, json.dumps(body).encode())
+
+    def body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self) -> None:
+        self.route("GET")
+
+    def do_POST(self) -> None:
+        self.route("POST")
+
+    def route(self, method: str) -> None:
+        time.sleep(self.delay)
+        path = urlparse(self.path).path
+
+        if path == "/license" and method == "POST":
+            return self.reply(200, mock_licence(self.body()))
+
+        if self.secret and self.headers.get("X-Secret-Key") != self.secret:
+            return self.result(401, "Secret Key is Invalid")
+
+        match = ROUTE.match(path)
+        if not match:
+            return self.result(404, "Not Found")
+
+        action, arg = match.group("action"), match.group("arg")
+        payload = json.loads(self.body() or b"{}") if method == "POST" else {}
+
+        try:
+            if action == "open":
+                return self.result(200, "Success", {"session_id": self.sessions.open()})
+
+            if action == "close":
+                self.sessions.close(arg)
+                return self.result(200, f"Successfully closed Session '{arg}'.")
+
+            session = self.sessions.get(payload["session_id"])
+
+            if action == "set_service_certificate":
+                return self.result(200, "Successfully set the Service Certificate.")
+
+            if action == "get_license_challenge":
+                session["kids"] = pssh_kids(payload["init_data"])
+                challenge = json.dumps({"kids": session["kids"]}).encode()
+                challenge = base64.b64encode(challenge).decode()
+                return self.result(200, "Success", {"challenge_b64": challenge})
+
+            if action == "parse_license":
+                licence = json.loads(base64.b64decode(payload["license_message"]))
+                session["keys"] = licence["keys"]
+                return self.result(200, "Successfully parsed the License message.")
+
+            if action == "get_keys":
+                keys = [
+                    {
+                        "key_id": key["kid"],
+                        "key": key["key"],
+                        "type": "CONTENT",
+                        "permissions": [],
+                    }
+                    for key in session["keys"]
+                    if key["key"] == mock_key(key["kid"])
+                ]
+                return self.result(200, "Success", {"keys": keys})
+
+        except KeyError as e:
+            return self.result(400, f"Missing or invalid field: {e}")
+
+        return self.result(404, "Not Found")
+
+
+@click.command()
+@click.option("--host", default=None, help="Interface to listen on")
+@click.option("--port", type=int, default=None, help="Port to listen on")
+@click.option("--secret", default=None, help="Required X-Secret-Key")
+@click.option("--delay", type=float, default=0.0, help="Seconds added to every reply")
+def main(host: str, port: int, secret: str, delay: float) -> None:
+    config = settings()["serve"]
+    url = urlparse(config["host"])
+
+    Handler.secret = config["secret"] if secret is None else secret
+    Handler.delay = delay
+
+    address = (host or url.hostname, port or url.port or 8786)
+    server = ThreadingHTTPServer(address, Handler)
+    click.echo(f"CDM stand-in listening on {address[0]}:{address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
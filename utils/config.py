@@ -1,10 +1,13 @@
-from pathlib import Path
 from typing import Any, Optional
 
 import httpx
 
 from rich.console import Console
 
+from utils.ratelimit import AsyncRateLimitTransport, RateLimitTransport
+from utils.retry import AsyncRetryTransport, RetryTransport
+from utils import workspace
+
 
 class Config:
     def __init__(
@@ -21,6 +24,7 @@ class Config:
         complete: Optional[bool] = None,
         all_audio: Optional[bool] = None,
         subtitles: Optional[bool] = None,
+        output: Optional[str] = None,
     ) -> None:
         
         if episode:
@@ -42,11 +46,11 @@ class Config:
         self.complete = complete
         self.all_audio = all_audio
         self.sub_only = subtitles
+        self.output = output
 
-        self.console = Console()
+        self.console = Console(stderr=bool(output))
 
-        self.tmp = Path("tmp")
-        self.tmp.mkdir(parents=True, exist_ok=True)
+        self.tmp = workspace.create(config)
 
         self.client = httpx.Client(
             headers={
@@ -56,5 +60,15 @@ class Config:
                     "Chrome/118.0.0.0 Safari/537.36"
                 ),
             },
-            timeout=20.0
+            timeout=20.0,
+            transport=RetryTransport(RateLimitTransport()),
+        )
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Async client sharing the headers, cookies and limits of self.client"""
+        return httpx.AsyncClient(
+            headers=self.client.headers,
+            cookies=self.client.cookies,
+            timeout=self.client.timeout,
+            transport=AsyncRetryTransport(AsyncRateLimitTransport()),
         )
\ No newline at end of file
@@ -46,7 +46,7 @@ main_help = f"""
             NOTES:
             Always use main URL of series for this method, not episode URLs
             Use the S01E01 format, or "episode name", to request episodes
-            Use --episode S01E01-S01E10 to request a range of episodes (from the same season)
+            Use --episode S01E01-S01E10 to request a range of episodes (can span seasons, e.g. S01E05-S02E03)
             Use --episode S01E01,S03E07,S10E12 (no spaces!) to request a mix of episodes
             Use --season S01,S03,S10 (no spaces!) to request a mix of seasons
     \b
@@ -76,6 +76,10 @@ main_help = f"""
                 python freevine.py --subtitles --epiode/--movie URL
             Use remote CDM (ALL4 not supported):
                 python freevine.py --remote --episode/--season URL
+            Print titles, info or search results as JSON or NDJSON records:
+                python freevine.py --output json --titles URL
+                python freevine.py --output ndjson --info --episode S01E01 URL
+                python freevine.py --output ndjson --search all4 "QUERY"
     \b
             NOTES:
             The order of the options isn't super strict, but it's recommended to follow the examples above
@@ -87,9 +91,11 @@ main_help = f"""
     \b
             python freevine.py --search all4 "QUERY"
             python freevine.py --search all4,ctv,itv "QUERY"
+            python freevine.py --search all4 "QUERY" --limit 50
     \b
             NOTES:
             You can search one or multiple services at the same time
+            Use --limit to set the number of results per service (default: 10, or 5 with multiple services)
             The results should produce usable URL to series or movie
             Some services have geo block even for searching
     \b    
@@ -0,0 +1,108 @@
+"""
+Embedded page data
+
+Show pages carry their data as a JSON blob inside a script tag:
+__NEXT_DATA__ on ITV and STV, window.__PARAMS__ on Channel 4 and
+window.__IPLAYER_REDUX_STATE__ on iPlayer. Rather than parsing the whole page,
+the body is streamed and scanned for the marker, the braces after it are
+matched while the rest arrives, and the response is closed as soon as the
+object ends. Only that slice is ever decoded
+"""
+
+import json
+import re
+
+from typing import Any, Iterable
+
+import httpx
+
+from utils.retry import check, RequestError
+
+NEXT_DATA = b'id="__NEXT_DATA__"'
+PARAMS = b"window.__PARAMS__"
+REDUX = b"window.__IPLAYER_REDUX_STATE__"
+
+TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*(?P<end>")?|[{}]')
+UNDEFINED = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|\bundefined\b')
+
+
+def extract(chunks: Iterable[bytes], marker: bytes) -> bytes:
+    """
+    Bytes of the first JSON object after marker, or None if there isn't one
+
+    Stops pulling chunks once the object is closed. Braces inside strings
+    are skipped; a string cut off at the end of a chunk is rescanned when
+    the next one arrives
+    """
+    parts = []
+    buffer = b""
+    found = False
+    depth = 0
+
+    for chunk in chunks:
+        buffer += chunk
+
+        if not found:
+            index = buffer.find(marker)
+            if index < 0:
+                buffer = buffer[-len(marker) + 1 :]
+                continue
+            start = buffer.find(b"{", index + len(marker))
+            if start < 0:
+                buffer = buffer[index:]
+                continue
+            buffer = buffer[start:]
+            found = True
+
+        pos = 0
+        for match in TOKENS.finditer(buffer):
+            token = match.group()
+            if token == b"{":
+                depth += 1
+            elif token == b"}":
+                depth -= 1
+                if depth == 0:
+                    parts.append(buffer[: match.end()])
+                    return b"".join(parts)
+            elif match.group("end") is None:
+                break
+            pos = match.end()
+        else:
+            pos = len(buffer)
+
+        parts.append(buffer[:pos])
+        buffer = buffer[pos:]
+
+    return None
+
+
+def loads(data: bytes, js: bool = False) -> Any:
+    """
+    Decode an extracted blob
+
+    js relaxes the parsing for object literals written out by page scripts
+    rather than a JSON serialiser: bare undefined becomes null and stray
+    zero-width non-joiners and raw newlines are tolerated
+    """
+    if not js:
+        return json.loads(data)
+
+    text = data.decode().replace("\u200c", "")
+    text = UNDEFINED.sub(
+        lambda m: "null" if m.group() == "undefined" else m.group(), text
+    )
+    return json.loads(text, strict=False)
+
+
+def embedded_json(
+    client: httpx.Client, url: str, marker: bytes, js: bool = False
+) -> Any:
+    """Fetch url and return the JSON object following marker"""
+    with client.stream("GET", url) as r:
+        check(r, "Failed to load page")
+        data = extract(r.iter_bytes(), marker)
+
+    if data is None:
+        raise RequestError(f"No {marker.decode()} data found at {url}")
+
+    return loads(data, js=js)
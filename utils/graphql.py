@@ -0,0 +1,159 @@
+"""
+GraphQL client
+
+Queries are sent as automatic persisted queries (APQ): a query goes out with
+its text and sha256 hash the first time, and with only the hash once the
+server has accepted it. Several operations can share one batched request when
+the server takes a list, and results are cached by operation and variables
+"""
+
+import hashlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from utils.cache import TTLCache
+from utils.retry import RequestError
+
+NOT_FOUND = ("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+NOT_SUPPORTED = ("PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+
+MISSING = object()
+
+
+class GraphQLError(RequestError):
+    pass
+
+
+class Operation:
+    __slots__ = ("name", "query", "variables", "hash", "ttl")
+
+    def __init__(
+        self, name: str, query: str, variables: dict = None, ttl: float = None
+    ) -> None:
+        self.name = name
+        self.query = " ".join(query.split())
+        self.variables = variables or {}
+        self.hash = hashlib.sha256(self.query.encode()).hexdigest()
+        self.ttl = ttl
+
+    @property
+    def key(self) -> list:
+        return [self.name, self.hash, self.variables]
+
+    def payload(self, full: bool) -> dict:
+        payload = {
+            "operationName": self.name,
+            "variables": self.variables,
+            "extensions": {"persistedQuery": {"version": 1, "sha256Hash": self.hash}},
+        }
+        if full:
+            payload["query"] = self.query
+        return payload
+
+
+def _codes(errors: list) -> set:
+    codes = set()
+    for error in errors:
+        codes.add(error.get("message"))
+        codes.add((error.get("extensions") or {}).get("code"))
+    return codes
+
+
+class GraphQL:
+    def __init__(
+        self, client: httpx.Client, url: str, cache: TTLCache = None
+    ) -> None:
+        self.client = client
+        self.url = url
+        self.cache = cache or TTLCache()
+        self.batching = True
+        self.persisted = True
+
+    def _post(self, body) -> dict:
+        r = self.client.post(self.url, json=body)
+        try:
+            response = r.json()
+        except ValueError:
+            response = None
+
+        if isinstance(response, list) and r.is_success:
+            return response
+        if isinstance(response, dict) and (r.is_success or "errors" in response):
+            return response
+        raise GraphQLError(f"GraphQL request failed: {r.status_code} {r.url}")
+
+    def _send(self, payloads: list) -> list:
+        if len(payloads) > 1 and self.batching:
+            try:
+                responses = self._post(payloads)
+                if isinstance(responses, list) and len(responses) == len(payloads):
+                    return responses
+            except GraphQLError:
+                pass
+            self.batching = False
+
+        if len(payloads) == 1:
+            return [self._post(payloads[0])]
+
+        with ThreadPoolExecutor(max_workers=min(len(payloads), 8)) as pool:
+            return list(pool.map(self._post, payloads))
+
+    def _result(self, operation: Operation, response: dict):
+        errors = response.get("errors")
+        if errors:
+            codes = _codes(errors)
+            if codes.intersection(NOT_SUPPORTED):
+                self.persisted = False
+                return MISSING
+            if codes.intersection(NOT_FOUND):
+                self.cache.pop(["apq", operation.hash])
+                return MISSING
+            if response.get("data") is None:
+                raise GraphQLError(f"{operation.name}: {errors[0].get('message')}")
+
+        self.cache.set(["apq", operation.hash], True, ttl=86400)
+        return self.cache.set(operation.key, response["data"], ttl=operation.ttl)
+
+    def execute(self, *operations: Operation) -> list:
+        """
+        Data for each operation, in order
+
+        Cached results are returned without a request; the rest go out
+        together. Hash-only queries the server has forgotten are sent again
+        with their text
+        """
+        results = [self.cache.get(op.key, MISSING) for op in operations]
+        pending = [i for i, result in enumerate(results) if result is MISSING]
+
+        for retry in (False, True):
+            if not pending:
+                break
+
+            payloads = [
+                operations[i].payload(
+                    full=retry
+                    or not self.persisted
+                    or not self.cache.get(["apq", operations[i].hash])
+                )
+                for i in pending
+            ]
+
+            missing = []
+            for i, response in zip(pending, self._send(payloads)):
+                results[i] = self._result(operations[i], response)
+                if results[i] is MISSING:
+                    missing.append(i)
+            pending = missing
+
+        if pending:
+            names = ", ".join(operations[i].name for i in pending)
+            raise GraphQLError(f"Server rejected persisted queries: {names}")
+
+        return results
+
+    def query(
+        self, name: str, query: str, variables: dict = None, ttl: float = None
+    ) -> dict:
+        return self.execute(Operation(name, query, variables, ttl))[0]
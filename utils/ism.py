@@ -0,0 +1,174 @@
+"""
+Smooth Streaming (ISM) manifests
+
+Some services publish only part of their ladder in the HLS master and the
+rest in a Smooth Streaming manifest. Both are read into Stream records, which
+are used to pick a quality and are written back out as a single HLS master
+for N_m3u8DL-RE
+"""
+
+import re
+import xml.etree.ElementTree as ET
+
+import httpx
+
+ATTRIBUTES = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class Stream:
+    __slots__ = (
+        "type",
+        "bitrate",
+        "codec",
+        "uri",
+        "width",
+        "height",
+        "group",
+        "name",
+        "language",
+    )
+
+    def __init__(
+        self,
+        type_: str,
+        bitrate: int,
+        codec: str,
+        uri: str,
+        width: int = 0,
+        height: int = 0,
+        group: str = None,
+        name: str = None,
+        language: str = None,
+    ) -> None:
+        self.type = type_
+        self.bitrate = bitrate
+        self.codec = codec
+        self.uri = uri
+        self.width = width
+        self.height = height
+        self.group = group
+        self.name = name
+        self.language = language
+
+    def __repr__(self) -> str:
+        return f"Stream({self.type}, {self.bitrate}, {self.codec}, {self.height}p)"
+
+    def to_m3u8(self) -> str:
+        if self.type == "audio":
+            return (
+                f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{self.group}",'
+                f'BANDWIDTH={self.bitrate},NAME="{self.name}",'
+                f'LANGUAGE="{self.language}",URI="{self.uri}"'
+            )
+        return (
+            f"#EXT-X-STREAM-INF:BANDWIDTH={self.bitrate},"
+            f"RESOLUTION={self.width}x{self.height},"
+            f'CODECS="{self.codec}",AUDIO="audio",CLOSED-CAPTIONS="CC"\n'
+            f"{self.uri}"
+        )
+
+
+class QualityLevel:
+    __slots__ = ("bitrate", "fourcc", "width", "height")
+
+    def __init__(self, element: ET.Element) -> None:
+        self.bitrate = int(element.get("Bitrate") or 0)
+        self.fourcc = element.get("FourCC") or ""
+        self.width = int(element.get("MaxWidth") or 0)
+        self.height = int(element.get("MaxHeight") or 0)
+
+
+class StreamIndex:
+    __slots__ = ("type", "name", "language", "levels")
+
+    def __init__(self, element: ET.Element) -> None:
+        self.type = element.get("Type")
+        self.name = element.get("Name")
+        self.language = element.get("Language")
+        self.levels = [
+            QualityLevel(level)
+            for level in element.iter("QualityLevel")
+            if level.get("Bitrate")
+        ]
+
+
+class Manifest:
+    """A parsed SmoothStreamingMedia document"""
+
+    VIDEO_CODECS = "avc1.4d401f,mp4a.40.2"
+
+    def __init__(self, data: bytes) -> None:
+        root = ET.fromstring(data)
+        self.indexes = [StreamIndex(index) for index in root.iter("StreamIndex")]
+
+    def streams(self, base_url: str) -> list:
+        """Every video and audio level as HLS renditions under base_url"""
+        streams = []
+        for index in self.indexes:
+            for level in index.levels:
+                if index.type == "video":
+                    uri = f"{base_url}QualityLevels({level.bitrate})/Manifest(video,format=m3u8-aapl)"
+                    streams.append(
+                        Stream(
+                            "video",
+                            level.bitrate,
+                            self.VIDEO_CODECS,
+                            uri,
+                            width=level.width,
+                            height=level.height,
+                        )
+                    )
+                elif index.type == "audio":
+                    uri = f"{base_url}QualityLevels({level.bitrate})/Manifest({index.name},format=m3u8-aapl)"
+                    streams.append(
+                        Stream(
+                            "audio",
+                            level.bitrate,
+                            level.fourcc.lower(),
+                            uri,
+                            group=index.name,
+                            name=level.fourcc,
+                            language=index.language,
+                        )
+                    )
+        return streams
+
+
+def fetch(client: httpx.Client, url: str) -> Manifest:
+    """The manifest at url, or None if it's missing or can't be parsed"""
+    try:
+        r = client.get(url)
+        return Manifest(r.content) if r.is_success else None
+    except (httpx.HTTPError, ET.ParseError):
+        return None
+
+
+def master_streams(m3u8: str) -> list:
+    """Variant streams listed in an HLS master playlist"""
+    streams = []
+    lines = iter(m3u8.splitlines())
+    for line in lines:
+        if not line.startswith("#EXT-X-STREAM-INF:"):
+            continue
+
+        attrs = {k: v.strip('"') for k, v in ATTRIBUTES.findall(line[18:])}
+        width, _, height = attrs.get("RESOLUTION", "0x0").partition("x")
+        streams.append(
+            Stream(
+                "video",
+                int(attrs.get("BANDWIDTH") or 0),
+                attrs.get("CODECS", ""),
+                next(lines, ""),
+                width=int(width or 0),
+                height=int(height or 0),
+            )
+        )
+    return streams
+
+
+def build_m3u8(master: str, streams: list) -> str:
+    """master followed by an entry for each stream"""
+    lines = [master.rstrip("\n")]
+    lines.extend(stream.to_m3u8() for stream in streams)
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Licence requests
+
+Every service sends its Widevine challenge through LicenceClient. A codec
+describes how the challenge is wrapped and the licence unwrapped; the client
+adds retries, a per-host concurrency limit and a latency histogram and status
+counts for each licence host, summarised by report() at the end of a run
+"""
+
+import base64
+import threading
+import time
+
+from urllib.parse import urlparse
+
+import httpx
+
+from utils.retry import policy
+from utils.utilities import info
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LicenceError(ValueError):
+    pass
+
+
+class Codec:
+    """Raw challenge as the request body, raw licence as the response body"""
+
+    def __init__(self, headers: dict = None) -> None:
+        self.headers = headers or {}
+
+    def encode(self, challenge: bytes) -> dict:
+        return {"content": challenge, "headers": self.headers}
+
+    def decode(self, response: httpx.Response) -> bytes:
+        return response.content
+
+    def error(self, response: httpx.Response) -> str:
+        return f"{response.status_code} {response.text[:200]}"
+
+
+class JSONCodec(Codec):
+    """Base64 challenge in a JSON payload, base64 licence in a JSON response"""
+
+    def __init__(
+        self,
+        payload: dict = None,
+        challenge_field: str = "message",
+        licence_field: str = "license",
+        headers: dict = None,
+    ) -> None:
+        super().__init__(headers)
+        self.payload = payload or {}
+        self.challenge_field = challenge_field
+        self.licence_field = licence_field
+
+    def encode(self, challenge: bytes) -> dict:
+        payload = {
+            **self.payload,
+            self.challenge_field: base64.b64encode(challenge).decode(),
+        }
+        return {"json": payload, "headers": self.headers}
+
+    def decode(self, response: httpx.Response) -> bytes:
+        return base64.b64decode(response.json()[self.licence_field])
+
+    def error(self, response: httpx.Response) -> str:
+        try:
+            return response.json()["status"]["type"]
+        except Exception:
+            return super().error(response)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.statuses = {}
+
+    def observe(self, seconds: float, status=None) -> None:
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if seconds <= bound),
+            len(self.buckets),
+        )
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def to_dict(self) -> dict:
+        labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+            "statuses": dict(self.statuses),
+        }
+
+
+_lock = threading.Lock()
+_histograms = {}
+_semaphores = {}
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc
+
+
+def _semaphore(host: str, limit: int) -> threading.BoundedSemaphore:
+    with _lock:
+        if host not in _semaphores:
+            _semaphores[host] = threading.BoundedSemaphore(limit)
+        return _semaphores[host]
+
+
+def _observe(host: str, seconds: float, status=None) -> None:
+    with _lock:
+        _histograms.setdefault(host, Histogram()).observe(seconds, status)
+
+
+def stats() -> dict:
+    """Licence latency and response statuses per host"""
+    with _lock:
+        return {host: histogram.to_dict() for host, histogram in _histograms.items()}
+
+
+def report() -> None:
+    """Log a line per licence host that was used this run"""
+    for host, data in stats().items():
+        statuses = ", ".join(f"{k}: {v}" for k, v in sorted(data["statuses"].items()))
+        slowest = next(
+            (label for label, n in reversed(data["buckets"].items()) if n), None
+        )
+        info(
+            f"Licence requests to {host}: {data['count']}, "
+            f"mean {data['mean'] * 1000:.0f} ms, slowest {slowest} ({statuses})"
+        )
+
+
+class LicenceClient:
+    """
+    Sends licence challenges over a service's own client
+
+    5xx, 429 and connection errors are retried following the shared retry
+    policy in utils.retry
+    """
+
+    def __init__(
+        self,
+        client: httpx.Client,
+        codec: Codec = None,
+        concurrency: int = 4,
+    ) -> None:
+        self.client = client
+        self.codec = codec or Codec()
+        self.concurrency = concurrency
+
+    def post(self, lic_url: str, challenge: bytes) -> bytes:
+        host = _host(lic_url)
+        request = self.codec.encode(challenge)
+        retry = policy()
+
+        for attempt in range(retry.attempts):
+            last = attempt == retry.attempts - 1
+            response = None
+            with _semaphore(host, self.concurrency):
+                start = time.perf_counter()
+                try:
+                    response = self.client.post(lic_url, **request)
+                except httpx.TransportError as e:
+                    if last:
+                        raise LicenceError(f"Licence request failed: {e}") from e
+                finally:
+                    status = response.status_code if response is not None else "error"
+                    _observe(host, time.perf_counter() - start, status)
+
+            if response is not None:
+                if response.is_success:
+                    return self.codec.decode(response)
+                if not retry.retryable(response) or last:
+                    raise LicenceError(
+                        f"Failed to get license! Error: {self.codec.error(response)}"
+                    )
+
+            time.sleep(retry.delay(attempt, response))
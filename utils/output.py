@@ -0,0 +1,49 @@
+import json
+import sys
+
+import click
+
+FORMATS = ("json", "ndjson")
+
+
+class Output:
+    """
+    Stream records to stdout as a JSON array or as newline-delimited JSON
+
+    Every record is written and flushed as soon as it's handed over, so consumers
+    can start reading before the last one has been produced
+    """
+
+    def __init__(self, fmt: str) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+
+        self.fmt = fmt
+        self.count = 0
+
+    def __enter__(self):
+        if self.fmt == "json":
+            click.echo("[", nl=False)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.fmt == "json":
+            click.echo("\n]" if self.count else "]")
+        sys.stdout.flush()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+
+        if self.fmt == "json":
+            click.echo(f"{',' if self.count else ''}\n  {line}", nl=False)
+        else:
+            click.echo(line)
+
+        self.count += 1
+        sys.stdout.flush()
+
+
+def write_records(records: list, fmt: str) -> None:
+    with Output(fmt) as output:
+        for record in records:
+            output.write(record)
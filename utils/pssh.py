@@ -0,0 +1,261 @@
+"""
+Widevine PSSH helpers
+
+PSSH boxes are taken from the manifest when possible. Otherwise they're read
+straight out of the init segment: only the box headers leading up to moov are
+requested, and the boxes are parsed in memory
+"""
+
+import base64
+import re
+import struct
+
+from functools import lru_cache
+
+WIDEVINE = bytes.fromhex("edef8ba979d64acea3c827dcd51d21ed")
+
+# Boxes that only hold other boxes and may lead to a pssh
+CONTAINERS = {b"moov", b"moof", b"trak", b"traf", b"mdia", b"minf", b"stbl", b"mvex"}
+
+HLS_KEY = re.compile(
+    r'#EXT-X-KEY:.*?KEYFORMAT="urn:uuid:edef8ba9-79d6-4ace-a3c8-27dcd51d21ed".*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+HLS_DATA = re.compile(r'URI="data:[^"]*?;base64,([^"]+)"', re.IGNORECASE)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number: int, value: bytes) -> bytes:
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _kid(kid) -> bytes:
+    if isinstance(kid, bytes):
+        return kid
+    return bytes.fromhex(kid.replace("-", "").strip())
+
+
+@lru_cache(maxsize=256)
+def _build(
+    kids: tuple,
+    version: int,
+    protection_scheme: str,
+    content_id: bytes,
+    provider: str,
+) -> str:
+    data = b"".join(_field(2, kid) for kid in kids)
+    if provider:
+        data += _field(3, provider.encode())
+    if content_id:
+        data += _field(4, content_id)
+    if protection_scheme:
+        (scheme,) = struct.unpack(">I", protection_scheme.encode())
+        data += _varint(9 << 3) + _varint(scheme)
+
+    header = struct.pack(">I16s", version << 24, WIDEVINE)
+    if version == 1:
+        header += struct.pack(">I", len(kids)) + b"".join(kids)
+
+    body = header + struct.pack(">I", len(data)) + data
+    box = struct.pack(">I4s", 8 + len(body), b"pssh") + body
+    return base64.b64encode(box).decode()
+
+
+def build_pssh(
+    *kids,
+    version: int = 0,
+    protection_scheme: str = None,
+    content_id: bytes = None,
+    provider: str = None,
+) -> str:
+    """
+    Base64 Widevine PSSH box for one or more key IDs
+
+    KIDs may be hex strings, with or without dashes, or raw bytes.
+    Version 1 boxes also list the KIDs in the box header
+    """
+    if version not in (0, 1):
+        raise ValueError(f"Unsupported PSSH version: {version}")
+
+    return _build(
+        tuple(_kid(kid) for kid in kids),
+        version,
+        protection_scheme,
+        content_id,
+        provider,
+    )
+
+
+def _read_varint(data: bytes, offset: int) -> tuple:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def pssh_kids(pssh: str) -> list:
+    """Hex KIDs of a base64 Widevine PSSH box, from the v1 header or the PSSH data"""
+    box = base64.b64decode(pssh)
+    version = box[8]
+    offset = 28
+    kids = []
+
+    if version == 1:
+        (count,) = struct.unpack_from(">I", box, offset)
+        offset += 4
+        kids = [box[offset + 16 * i : offset + 16 * (i + 1)].hex() for i in range(count)]
+        offset += 16 * count
+
+    (size,) = struct.unpack_from(">I", box, offset)
+    data, offset = box[offset + 4 : offset + 4 + size], 0
+
+    while offset < len(data):
+        tag, offset = _read_varint(data, offset)
+        if tag & 7 == 0:
+            _, offset = _read_varint(data, offset)
+        elif tag & 7 == 2:
+            length, offset = _read_varint(data, offset)
+            if tag >> 3 == 2 and length == 16:
+                kids.append(data[offset : offset + length].hex())
+            offset += length
+        else:
+            break
+
+    return list(dict.fromkeys(kids))
+
+
+def boxes(data: memoryview, start: int = 0, end: int = None):
+    """Yield (type, offset, header size, box size) for each box between start and end"""
+    end = len(data) if end is None else end
+    offset = start
+
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+
+        if size == 1:
+            if offset + 16 > end:
+                return
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+
+        if size < header:
+            return
+
+        yield kind, offset, header, size
+        offset += size
+
+
+def find_pssh(data, system_id: bytes = WIDEVINE) -> list:
+    """Every complete pssh box for system_id, in file order"""
+    view = memoryview(data)
+    found = []
+
+    def walk(start: int, end: int) -> None:
+        for kind, offset, header, size in boxes(view, start, end):
+            if offset + size > end:
+                return
+            if kind in CONTAINERS:
+                walk(offset + header, offset + size)
+            elif kind == b"pssh" and view[offset + 12 : offset + 28] == system_id:
+                found.append(bytes(view[offset : offset + size]))
+
+    walk(0, len(view))
+    return found
+
+
+class RangeReader:
+    """Random access to a remote file, one HTTP Range request per cache miss"""
+
+    def __init__(self, client, url: str, chunk: int = 16384) -> None:
+        self.client = client
+        self.url = url
+        self.chunk = chunk
+        self.start = 0
+        self.data = b""
+        self.complete = False
+
+    def read(self, start: int, end: int) -> memoryview:
+        cached = self.start <= start and end <= self.start + len(self.data)
+        if not cached and not self.complete:
+            stop = max(end, start + self.chunk) - 1
+            r = self.client.get(self.url, headers={"Range": f"bytes={start}-{stop}"})
+            r.raise_for_status()
+
+            # Servers that ignore Range send the whole file
+            self.complete = r.status_code != 206
+            self.start = 0 if self.complete else start
+            self.data = r.content
+
+        return memoryview(self.data)[start - self.start : end - self.start]
+
+
+def init_pssh(client, url: str) -> str:
+    """
+    Widevine PSSH from the moov box of an init segment
+
+    Top-level boxes are skipped by their headers alone, so nothing past moov is
+    ever requested
+    """
+    reader = RangeReader(client, url)
+    offset = 0
+
+    while True:
+        head = reader.read(offset, offset + 16)
+        if len(head) < 8:
+            return None
+
+        kind, _, header, size = next(boxes(head, 0, len(head)), (None,) * 4)
+        if kind is None or kind in (b"mdat", b"moof"):
+            return None
+
+        if kind == b"moov":
+            found = find_pssh(reader.read(offset, offset + size))
+            return base64.b64encode(found[0]).decode() if found else None
+
+        offset += size
+
+
+def mpd_pssh(soup) -> str:
+    """Widevine PSSH from a DASH manifest, or None if it doesn't carry one"""
+    for protection in soup.find_all("ContentProtection"):
+        scheme = protection.attrs.get("schemeIdUri", "").lower()
+        if WIDEVINE.hex() in scheme.replace("-", ""):
+            pssh = protection.find("pssh")
+            if pssh and pssh.text.strip():
+                return pssh.text.strip()
+
+    kids = default_kids(soup)
+    return build_pssh(kids[0]) if kids else None
+
+
+def default_kids(soup) -> list:
+    """Every distinct cenc:default_KID in a DASH manifest, in document order"""
+    return list(
+        dict.fromkeys(
+            x.attrs["cenc:default_KID"].replace("-", "").lower()
+            for x in soup.find_all("ContentProtection")
+            if x.attrs.get("cenc:default_KID")
+        )
+    )
+
+
+def hls_pssh(m3u8: str) -> str:
+    """Widevine PSSH from an EXT-X-KEY tag, or None if the playlist doesn't carry one"""
+    key = HLS_KEY.search(m3u8)
+    data = HLS_DATA.search(key.group()) if key else None
+    return data.group(1) if data else None
@@ -0,0 +1,154 @@
+"""
+Per-host rate limiting
+
+Every client request goes through a token bucket for its host. Buckets are
+shared by all clients in the process, so parallel searches, season fetches
+and licence requests to one host draw from the same budget.
+
+A 429 or 503 halves the host's rate and pauses it for Retry-After; each
+success afterwards adds back a little, until the configured rate is reached
+"""
+
+import asyncio
+import email.utils
+import threading
+import time
+
+import httpx
+
+THROTTLED = {429, 503}
+
+DEFAULTS = {
+    "rate": 10.0,
+    "burst": 20,
+    "min_rate": 0.5,
+    "hosts": {},
+}
+
+
+class Bucket:
+    def __init__(self, rate: float, burst: int, min_rate: float) -> None:
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def throttled(self, retry_after: float) -> None:
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self) -> None:
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class Limiter:
+    def __init__(self, settings: dict = None) -> None:
+        self.settings = {**DEFAULTS, **(settings or {})}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host: str) -> Bucket:
+        """The host's bucket, or None if it isn't rate limited"""
+        with self.lock:
+            if host not in self.buckets:
+                hosts = self.settings.get("hosts") or {}
+                config = {**self.settings, **(hosts.get(host) or {})}
+                self.buckets[host] = (
+                    Bucket(config["rate"], config["burst"], config["min_rate"])
+                    if config.get("rate")
+                    else None
+                )
+            return self.buckets[host]
+
+    def feedback(self, bucket: Bucket, response: httpx.Response) -> None:
+        if response.status_code in THROTTLED:
+            bucket.throttled(retry_after(response))
+        elif response.status_code < 400:
+            bucket.succeeded()
+
+
+def retry_after(response: httpx.Response, default: float = 1.0) -> float:
+    """Seconds from a Retry-After header, in either of its two formats"""
+    value = response.headers.get("retry-after", "").strip()
+    if not value:
+        return default
+    if value.replace(".", "", 1).isdigit():
+        return min(float(value), 60.0)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+        return min(max(0.0, date.timestamp() - time.time()), 60.0)
+    except (TypeError, ValueError):
+        return default
+
+
+_limiter = Limiter()
+
+
+def configure(settings: dict = None) -> Limiter:
+    """Rebuild the shared limiter from the rate_limit section of config.yaml"""
+    global _limiter
+    _limiter = Limiter(settings)
+    return _limiter
+
+
+class RateLimitTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport = None, **kwargs) -> None:
+        self.transport = transport or httpx.HTTPTransport(**kwargs)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = _limiter
+        bucket = limiter.bucket(request.url.host)
+        if bucket is None:
+            return self.transport.handle_request(request)
+
+        wait = bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+        response = self.transport.handle_request(request)
+        limiter.feedback(bucket, response)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRateLimitTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport = None, **kwargs) -> None:
+        self.transport = transport or httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = _limiter
+        bucket = limiter.bucket(request.url.host)
+        if bucket is None:
+            return await self.transport.handle_async_request(request)
+
+        wait = bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        response = await self.transport.handle_async_request(request)
+        limiter.feedback(bucket, response)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,231 @@
+"""
+Retry policy and failure isolation
+
+Transient failures are retried where it's safe to do so: idempotent requests
+in the HTTP layer, licence requests in utils.license and downloader runs here.
+Whatever still fails only takes down its own episode; the rest of the batch
+carries on and the failures are reported at the end
+"""
+
+import asyncio
+import random
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import httpx
+
+from utils.ratelimit import retry_after
+from utils.utilities import error, info
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
+
+DEFAULTS = {
+    "attempts": 3,
+    "backoff": 0.5,
+    "cap": 30.0,
+    "downloads": 2,
+}
+
+
+class RequestError(ValueError):
+    pass
+
+
+class DownloadError(ValueError):
+    pass
+
+
+class BatchError(Exception):
+    def __init__(self, failures: list) -> None:
+        super().__init__(f"{len(failures)} download(s) failed")
+        self.failures = failures
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; Retry-After wins when the server sends it"""
+
+    def __init__(self, settings: dict = None) -> None:
+        settings = {**DEFAULTS, **(settings or {})}
+        self.attempts = max(1, int(settings["attempts"]))
+        self.backoff = float(settings["backoff"])
+        self.cap = float(settings["cap"])
+        self.downloads = max(1, int(settings["downloads"]))
+
+    def retryable(self, response: httpx.Response) -> bool:
+        return response.status_code in RETRY_STATUS
+
+    def delay(self, attempt: int, response: httpx.Response = None) -> float:
+        if response is not None and "retry-after" in response.headers:
+            return min(retry_after(response), self.cap)
+        return random.uniform(0, min(self.cap, self.backoff * 2**attempt))
+
+
+_policy = RetryPolicy()
+
+
+def configure(settings: dict = None) -> RetryPolicy:
+    """Rebuild the shared policy from the retries section of config.yaml"""
+    global _policy
+    _policy = RetryPolicy(settings)
+    return _policy
+
+
+def policy() -> RetryPolicy:
+    return _policy
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Retries idempotent requests on connection errors and 429/5xx responses"""
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT:
+            return self.transport.handle_request(request)
+
+        retry = _policy
+        for attempt in range(retry.attempts):
+            last = attempt == retry.attempts - 1
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if last:
+                    raise
+                time.sleep(retry.delay(attempt))
+                continue
+
+            if last or not retry.retryable(response):
+                return response
+
+            response.close()
+            time.sleep(retry.delay(attempt, response))
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT:
+            return await self.transport.handle_async_request(request)
+
+        retry = _policy
+        for attempt in range(retry.attempts):
+            last = attempt == retry.attempts - 1
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                if last:
+                    raise
+                await asyncio.sleep(retry.delay(attempt))
+                continue
+
+            if last or not retry.retryable(response):
+                return response
+
+            await response.aclose()
+            await asyncio.sleep(retry.delay(attempt, response))
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def check(response, message: str = "Request failed") -> None:
+    """Raise RequestError for a non-2xx response instead of exiting"""
+    if not response.is_success:
+        raise RequestError(f"{message}: {response.status_code} {response.url}")
+
+
+def run_downloader(args: list) -> None:
+    """
+    Run the downloader, re-invoking it if it exits with an error
+
+    N_m3u8DL-RE picks up the segments it already has in the temp dir, so a
+    second run only fetches what's missing
+    """
+    retry = _policy
+    for attempt in range(retry.downloads):
+        try:
+            subprocess.run(args, check=True)
+            return
+        except subprocess.CalledProcessError as e:
+            if attempt == retry.downloads - 1:
+                raise DownloadError("Download failed or was interrupted") from e
+
+            info(f"Downloader exited with code {e.returncode}. Retrying...")
+            time.sleep(retry.delay(attempt))
+
+
+def download_all(downloads: list, download) -> None:
+    """
+    Call download for every title, isolating failures to their own title
+
+    A failed title is logged and skipped; BatchError lists them all once the
+    rest have finished. Ctrl+C still stops the whole batch
+    """
+    failures = []
+
+    for stream in downloads:
+        try:
+            download(stream)
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            error(f"{str(stream)}: {e}")
+            failures.append((stream, e))
+
+    if failures:
+        info(f"{len(downloads) - len(failures)}/{len(downloads)} downloads completed")
+        for stream, e in failures:
+            error(f"Failed: {str(stream)} ({e})")
+        raise BatchError(failures)
+
+
+class Lookahead:
+    """Futures for titles, submitted up to ahead titles past the one asked for"""
+
+    def __init__(self, pool, downloads: list, resolve, ahead: int) -> None:
+        self.pool = pool
+        self.downloads = list(downloads)
+        self.positions = {stream: i for i, stream in enumerate(self.downloads)}
+        self.resolve = resolve
+        self.ahead = ahead
+        self.futures = {}
+        if self.downloads:
+            self.submit(0)
+
+    def submit(self, index: int) -> None:
+        for stream in self.downloads[index : index + self.ahead + 1]:
+            if stream not in self.futures:
+                self.futures[stream] = self.pool.submit(self.resolve, stream)
+
+    def __getitem__(self, stream):
+        self.submit(self.positions[stream])
+        return self.futures[stream]
+
+
+@contextmanager
+def prefetch(downloads: list, resolve, workers: int = 4, ahead: int = None):
+    """
+    Run resolve for titles on a thread pool ahead of their downloads
+
+    Yields a Lookahead; indexing it by title gives that title's future and
+    queues the next ahead titles, or every title when ahead is None. Each
+    download waits on its own lookup while later ones carry on in the
+    background. An exception is raised from result() and fails only that
+    title
+    """
+    pool = ThreadPoolExecutor(max_workers=workers)
+    ahead = len(downloads) if ahead is None else ahead
+    try:
+        yield Lookahead(pool, downloads, resolve, ahead)
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -37,6 +37,7 @@ def _dict(keywords: str):
                 "limit": "100",
                 "offset": "0",
             },
+            "paging": {"key": "offset", "start": 0, "step": 100, "size": 100},
             "method": "GET",
         },
         {
@@ -63,6 +64,7 @@ def _dict(keywords: str):
                 "contentType": "Channels",
                 "searchFields": "Title,Cast",
             },
+            "paging": {"key": "pageNumber", "start": 1, "step": 1, "size": 20},
             "method": "GET",
         },
         {
@@ -88,6 +90,7 @@ def _dict(keywords: str):
                 "pageSize": "20",
                 "term": f"{keywords}",
             },
+            "paging": {"key": "pageNumber", "start": 1, "step": 1, "size": 20},
             "method": "GET",
         },
         {
@@ -140,6 +143,7 @@ def _dict(keywords: str):
                 "q": f"{keywords}",
                 "spelling": "strict",
             },
+            "paging": {"key": "page", "start": 1, "step": 1, "size": 10},
         },
         {
             "name": "TubiTV",
@@ -187,21 +191,13 @@ def _dict(keywords: str):
 
 
 def _parse(query: dict, service: dict, client=None):
-    template = """
-    [bold]{service}[/bold]
-    Title: {title}
-    Type: {type}
-    Synopsis: {synopsis}
-    Link: {url}
-    """
-
     results = []
 
     if service["name"] == "BBC iPlayer":
         if query:
             for field in query["results"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=field["synopsis"],
@@ -214,7 +210,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["results"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["brand"]["title"],
                         synopsis=field["brand"]["description"],
@@ -229,7 +225,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["shows"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=field.get("s_desc"),
@@ -255,7 +251,7 @@ def _parse(query: dict, service: dict, client=None):
                 _id = re.sub(r"a000\d+", "", _id)
 
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=title,
                         synopsis=field["data"]["synopsis"],
@@ -268,7 +264,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["records"]["page"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=field.get("resultDescriptionTx"),
@@ -283,7 +279,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["data"]["items"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["metadata"][0]["title"],
                         synopsis=field["metadata"][0].get("longDescription"),
@@ -298,7 +294,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["data"]["searchMedia"]["page"]["items"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=None,
@@ -313,7 +309,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query["result"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=None,
@@ -328,7 +324,7 @@ def _parse(query: dict, service: dict, client=None):
         if query:
             for field in query:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["name"],
                         synopsis=field.get("synopsis"),
@@ -357,7 +353,7 @@ def _parse(query: dict, service: dict, client=None):
         for field in query["data"]:
             if "timeline" not in field["type"]:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["name"],
                         synopsis=field.get("synopsis"),
@@ -375,7 +371,7 @@ def _parse(query: dict, service: dict, client=None):
             for field in query["view"]:
                 _desc = field["content"].get("descriptions")
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["content"]["title"],
                         synopsis=_desc["250"]["text"] if _desc.get("250") else None,
@@ -388,7 +384,7 @@ def _parse(query: dict, service: dict, client=None):
                 )
         else:
             results.append(
-                template.format(
+                dict(
                     service=service["name"],
                     title="US IP-address required",
                     synopsis="",
@@ -410,7 +406,7 @@ def _parse(query: dict, service: dict, client=None):
                     else field["type"]
                 )
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=field.get("description"),
@@ -424,7 +420,7 @@ def _parse(query: dict, service: dict, client=None):
                 )
         else:
             results.append(
-                template.format(
+                dict(
                     service=service["name"],
                     title="US IP-address required",
                     synopsis="",
@@ -443,7 +439,7 @@ def _parse(query: dict, service: dict, client=None):
             ]
             for field in hits:
                 results.append(
-                    template.format(
+                    dict(
                         service=service["name"],
                         title=field["title"],
                         synopsis=field.get("synopsis"),
@@ -1,31 +1,49 @@
-import json
+import asyncio
+import math
+
+from collections import deque
+
 import httpx
 
 from rich.console import Console
 
 from utils.search.api import _dict, _parse
+from utils.output import Output
+from utils.ratelimit import AsyncRateLimitTransport, RateLimitTransport
+from utils.retry import AsyncRetryTransport, RetryTransport
 
 console = Console()
 
+TEMPLATE = """
+    [bold]{service}[/bold]
+    Title: {title}
+    Type: {type}
+    Synopsis: {synopsis}
+    Link: {url}
+    """
+
+HEADERS = {
+    "user-agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/118.0.0.0 Safari/537.36"
+    ),
+}
+
 
 class Config:
-    def __init__(self, alias: str, keywords: str) -> None:
+    def __init__(self, alias: str, keywords: str, limit: int = None) -> None:
         if alias:
             alias = alias.upper()
         if keywords:
             keywords = keywords.lower()
 
         self.client = httpx.Client(
-            headers={
-                "user-agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/118.0.0.0 Safari/537.36"
-                ),
-            }
+            headers=HEADERS, transport=RetryTransport(RateLimitTransport())
         )
         self.alias = [alias]
         self.keywords = keywords
+        self.limit = limit
 
         if "," in self.alias[0]:
             self.alias = [x for x in self.alias[0].split(",")]
@@ -33,14 +51,30 @@ class Config:
         self.services = _dict(self.keywords)
 
 
-def search_get(search: object, service: dict):
+def set_page(service: dict, page: int) -> dict:
+    paging = service.get("paging")
+    if not paging:
+        return service
+
+    value = paging["start"] + page * paging["step"]
+    field = "payload" if service["method"] == "POST" else "params"
+
+    request = dict(service)
+    request[field] = {
+        **service[field],
+        paging["key"]: value if field == "payload" else str(value),
+    }
+    return request
+
+
+async def search_get(client: httpx.AsyncClient, service: dict):
     url = service["url"]
     params = service.get("params", {})
-    search.client.headers.update(service.get("header", {}))
+    headers = service.get("header", {})
 
     cookies = service.get("collect", {})
 
-    r = search.client.get(url, cookies=cookies, params=params)
+    r = await client.get(url, headers=headers, cookies=cookies, params=params)
 
     if not r.is_success:
         return None
@@ -50,19 +84,19 @@ def search_get(search: object, service: dict):
         return None
 
 
-def search_post(search: object, service: dict):
+async def search_post(client: httpx.AsyncClient, service: dict):
     url = service["url"]
-    search.client.headers.update(service.get("header", {}))
+    headers = dict(service.get("header", {}))
     payload = service.get("payload", {})
 
     if service.get("token"):
         try:
-            token = search.client.get(service["token"]).json()["csrf"]
-            search.client.headers.update({"csrf-token": token})
+            token = (await client.get(service["token"])).json()["csrf"]
+            headers.update({"csrf-token": token})
         except:
             return None
 
-    r = search.client.post(url, cookies=search.client.cookies, json=payload)
+    r = await client.post(url, headers=headers, json=payload)
 
     if not r.is_success:
         return None
@@ -72,8 +106,105 @@ def search_post(search: object, service: dict):
         return None
 
 
-def search_engine(alias: str, keywords: str):
-    cfg = Config(alias, keywords)
+class Results:
+    """
+    Async iterator over the search results of a single service
+
+    Pages are only requested when the consumer runs out of buffered results.
+    With a limit, every page still needed to reach it is requested concurrently
+    """
+
+    def __init__(self, client, sync_client, service: dict, limit: int = None):
+        self.client = client
+        self.sync_client = sync_client
+        self.service = service
+        self.limit = limit
+
+        self.buffer = deque()
+        self.page = 0
+        self.count = 0
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        while not self.buffer:
+            if self.done or self._limit_reached():
+                raise StopAsyncIteration
+            await self._fetch()
+
+        if self._limit_reached():
+            raise StopAsyncIteration
+
+        self.count += 1
+        return self.buffer.popleft()
+
+    def _limit_reached(self) -> bool:
+        return self.limit is not None and self.count >= self.limit
+
+    def _pages(self) -> range:
+        paging = self.service.get("paging")
+        if not paging:
+            return range(1)
+
+        if self.limit is None:
+            return range(self.page, self.page + 1)
+
+        missing = self.limit - self.count - len(self.buffer)
+        return range(self.page, self.page + max(1, math.ceil(missing / paging["size"])))
+
+    async def _query(self, page: int):
+        service = set_page(self.service, page)
+
+        if service["method"] == "POST":
+            return await search_post(self.client, service)
+        return await search_get(self.client, service)
+
+    async def _fetch(self) -> None:
+        paging = self.service.get("paging")
+        pages = self._pages()
+        self.page = pages.stop
+
+        queries = await asyncio.gather(*(self._query(page) for page in pages))
+
+        for query in queries:
+            results = await asyncio.to_thread(
+                _parse, query, self.service, self.sync_client
+            )
+            self.buffer.extend(results)
+
+            if not paging or len(results) < paging["size"]:
+                self.done = True
+                break
+
+
+async def collect(results: Results) -> list:
+    return [result async for result in results]
+
+
+async def stream(results: Results, output: Output) -> None:
+    async for result in results:
+        output.write(result)
+
+
+async def search_services(cfg: Config, services: list, output: Output = None) -> list:
+    async with httpx.AsyncClient(
+        headers=HEADERS,
+        timeout=20.0,
+        transport=AsyncRetryTransport(AsyncRateLimitTransport()),
+    ) as client:
+        streams = [
+            Results(client, cfg.client, service, cfg.limit) for service in services
+        ]
+        if output is not None:
+            return await asyncio.gather(*(stream(x, output) for x in streams))
+
+        return await asyncio.gather(*(collect(x) for x in streams))
+
+
+def search_engine(alias: str, keywords: str, limit: int = None, output: str = None):
+    cfg = Config(alias, keywords, limit)
 
     services = [
         service
@@ -83,27 +214,17 @@ def search_engine(alias: str, keywords: str):
         )
     ]
 
-    queries = []
+    if cfg.limit is None:
+        cfg.limit = 5 if len(services) >= 2 else 10
 
-    with console.status("Searching..."):
-        for service in services:
-            if service["method"] == "GET":
-                query = search_get(cfg, service)
-            if service["method"] == "POST":
-                query = search_post(cfg, service)
+    if output:
+        with Output(output) as out:
+            asyncio.run(search_services(cfg, services, out))
+        return
 
-            results = _parse(query, service, cfg.client)
-            queries.append(results)
-
-    queries = [results for results in queries]
-
-    num_matches = 5 if len(services) >= 2 else 10
+    with console.status("Searching..."):
+        queries = asyncio.run(search_services(cfg, services))
 
-    matches = [
-        [result for result in query if service["name"] in result][:num_matches]
-        for service in services
-        for query in queries
-    ]
-    for match in matches:
-        for result in match:
-            console.print(result)
+    for results in queries:
+        for result in results:
+            console.print(TEMPLATE.format(**result))
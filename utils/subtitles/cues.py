@@ -0,0 +1,35 @@
+def _join(first: str, second: str) -> str:
+    lines = first.split("\n")
+    lines.extend(x for x in second.split("\n") if x not in lines)
+    return "\n".join(lines)
+
+
+def merge_cues(cues, tolerance: float = 0.05):
+    """
+    Drop duplicate cues and merge cues that overlap
+
+    Segmented subtitle tracks repeat a cue in every segment it overlaps, which
+    players then show as flicker. Repeats of the same text are joined when they
+    touch; cues with different text are merged into one cue over both time
+    ranges when they overlap, keeping each line once. Works on a stream of
+    cues in start order, holding a single cue back
+    """
+    pending = None
+
+    for start, end, text in cues:
+        if end <= start:
+            continue
+
+        if pending is not None:
+            if text == pending[2] and start <= pending[1] + tolerance:
+                pending = (pending[0], max(end, pending[1]), text)
+                continue
+            if start < pending[1] - tolerance:
+                pending = (pending[0], max(end, pending[1]), _join(pending[2], text))
+                continue
+            yield pending
+
+        pending = (start, end, text)
+
+    if pending is not None:
+        yield pending
@@ -0,0 +1,127 @@
+"""
+Background subtitle fetching
+
+Tracks are requested as soon as their URL is known and converted to SRT on a
+worker thread while the service carries on with manifests and licences.
+The converted file is only waited on right before it's handed to the muxer.
+cancel_pending() stops whatever is left before the workspace is removed
+"""
+
+import itertools
+import shutil
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import urlparse
+from uuid import uuid4
+
+from utils.utilities import error
+from utils.subtitles.cues import merge_cues
+from utils.subtitles.srt import write_srt
+from utils.subtitles.ttml import ttml_cues
+from utils.subtitles.vtt import vtt_cues
+
+CONVERTERS = {
+    "vtt": vtt_cues,
+    "srt": vtt_cues,
+    "ttml": ttml_cues,
+}
+
+EXTENSIONS = {
+    ".vtt": "vtt",
+    ".webvtt": "vtt",
+    ".srt": "srt",
+    ".ttml": "ttml",
+    ".ttml2": "ttml",
+    ".dfxp": "ttml",
+    ".xml": "ttml",
+}
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="subtitles")
+_futures = set()
+_lock = threading.Lock()
+
+
+def cancel_pending() -> None:
+    """Cancel tracks that haven't started and wait for the ones that have"""
+    with _lock:
+        futures = list(_futures)
+        _futures.clear()
+
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+
+def _done(future) -> None:
+    with _lock:
+        _futures.discard(future)
+
+
+def detect(head: bytes, url: str = "", content_type: str = "") -> str:
+    """Subtitle format from the first bytes, falling back to the content type and URL"""
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if start.startswith(b"WEBVTT"):
+        return "vtt"
+    if start.startswith(b"<"):
+        return "ttml"
+    if start[:1].isdigit():
+        return "srt"
+
+    content_type = content_type.lower()
+    if "vtt" in content_type:
+        return "vtt"
+    if "xml" in content_type:
+        return "ttml"
+
+    return EXTENSIONS.get(Path(urlparse(url).path).suffix.lower(), "vtt")
+
+
+def convert(chunks, path: Path, url: str = "", content_type: str = "") -> int:
+    """Convert a stream of WebVTT, SRT, TTML or DFXP bytes to a clean SRT file"""
+    chunks = iter(chunks)
+    head = next(chunks, b"")
+    cues = CONVERTERS[detect(head, url, content_type)](itertools.chain([head], chunks))
+
+    return write_srt(merge_cues(cues), path)
+
+
+class Subtitle:
+    """A subtitle track being fetched and converted to SRT in the background"""
+
+    def __init__(self, client, url: str, tmp: Path) -> None:
+        self.url = url
+        self.path = Path(tmp) / f"{uuid4().hex}.srt"
+        self.future = _executor.submit(self._fetch, client)
+        with _lock:
+            _futures.add(self.future)
+        self.future.add_done_callback(_done)
+
+    def _fetch(self, client) -> int:
+        with client.stream("GET", self.url, follow_redirects=True) as r:
+            if r.status_code == 404:
+                return 0
+            r.raise_for_status()
+            return convert(
+                r.iter_bytes(), self.path, self.url, r.headers.get("content-type", "")
+            )
+
+    def result(self, service: object):
+        """
+        Wait for the track and return its path, or None if it couldn't be fetched
+
+        Tracks that won't be muxed are moved next to the video
+        """
+        try:
+            if not self.future.result():
+                return None
+        except Exception as e:
+            error(f"Unable to fetch subtitles: {str(e).splitlines()[0]}")
+            return None
+
+        if service.sub_only or service.config["subtitles"]["no_mux"] == "true":
+            target = Path(service.save_path) / f"{service.filename}.srt"
+            return Path(shutil.move(self.path, target))
+
+        return self.path
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+
+def timestamp(seconds: float) -> str:
+    ms = max(0, round(seconds * 1000))
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{ms:03}"
+
+
+def write_srt(cues, path: Path) -> int:
+    """
+    Write (start, end, text) cues to an SRT file as they are produced
+
+    Returns the number of cues written
+    """
+    count = 0
+    with open(path, "w", encoding="UTF-8") as f:
+        for start, end, text in cues:
+            count += 1
+            f.write(f"{count}\n{timestamp(start)} --> {timestamp(end)}\n{text}\n\n")
+
+    return count
@@ -0,0 +1,141 @@
+"""
+Streaming TTML/DFXP parser
+
+Cues are yielded as soon as their <p> element closes and the element is then
+discarded, so memory stays flat no matter how long the document is
+"""
+
+import re
+
+from lxml import etree
+
+TTP = "http://www.w3.org/ns/ttml#parameter"
+
+CLOCK_TIME = re.compile(
+    r"^(\d+):(\d{2}):(\d{2})(?:(\.\d+)|:(\d+)(?:\.(\d+))?)?$"
+)
+OFFSET_TIME = re.compile(r"^(\d+(?:\.\d+)?)(h|m|s|ms|f|t)$")
+
+
+class Timing:
+    """Frame and tick rates declared on the <tt> root element"""
+
+    def __init__(self, root=None) -> None:
+        attrs = root.attrib if root is not None else {}
+
+        frame_rate = int(attrs.get(f"{{{TTP}}}frameRate", 30))
+        multiplier = attrs.get(f"{{{TTP}}}frameRateMultiplier", "1 1").split()
+        sub_frame_rate = int(attrs.get(f"{{{TTP}}}subFrameRate", 1))
+
+        self.frame_rate = frame_rate * int(multiplier[0]) / int(multiplier[1])
+        self.sub_frame_rate = sub_frame_rate
+
+        tick_rate = attrs.get(f"{{{TTP}}}tickRate")
+        if tick_rate is not None:
+            self.tick_rate = int(tick_rate)
+        elif f"{{{TTP}}}frameRate" in attrs:
+            self.tick_rate = self.frame_rate * sub_frame_rate
+        else:
+            self.tick_rate = 1
+
+    def seconds(self, value: str) -> float:
+        """Convert a TTML time expression to seconds"""
+        value = value.strip()
+
+        clock = CLOCK_TIME.match(value)
+        if clock:
+            hours, minutes, secs, fraction, frames, sub_frames = clock.groups()
+            total = int(hours) * 3600 + int(minutes) * 60 + int(secs)
+            if fraction:
+                total += float(fraction)
+            if frames:
+                total += int(frames) / self.frame_rate
+            if sub_frames:
+                total += int(sub_frames) / self.sub_frame_rate / self.frame_rate
+            return total
+
+        offset = OFFSET_TIME.match(value)
+        if offset:
+            count, metric = float(offset.group(1)), offset.group(2)
+            if metric == "h":
+                return count * 3600
+            if metric == "m":
+                return count * 60
+            if metric == "s":
+                return count
+            if metric == "ms":
+                return count / 1000
+            if metric == "f":
+                return count / self.frame_rate
+            return count / self.tick_rate
+
+        raise ValueError(f"Invalid TTML time expression: {value}")
+
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _text(elem) -> str:
+    # <br/> becomes a LINE SEPARATOR so the remaining whitespace, including
+    # raw newlines, can be collapsed the way TTML renders it
+    for br in elem.iter("{*}br"):
+        br.text = "\u2028"
+
+    text = "".join(elem.itertext())
+    lines = (" ".join(line.split()) for line in text.split("\u2028"))
+    return "\n".join(line for line in lines if line)
+
+
+def ttml_cues(chunks):
+    """
+    Yield (start, end, text) cues, in seconds, from an iterable of TTML bytes
+
+    Timing is resolved against parent containers, so <div>/<body> offsets
+    are honoured as well as absolute <p> times
+    """
+    parser = etree.XMLPullParser(
+        events=("start", "end"),
+        tag=("{*}tt", "{*}body", "{*}div", "{*}p"),
+        resolve_entities=False,
+        huge_tree=True,
+    )
+    timing = Timing()
+    offsets = []
+
+    for chunk in chunks:
+        parser.feed(chunk)
+
+        for event, elem in parser.read_events():
+            name = _local(elem.tag)
+
+            if event == "start":
+                if name == "tt":
+                    timing = Timing(elem)
+
+                parent = offsets[-1] if offsets else 0.0
+                begin = elem.get("begin")
+                offsets.append(parent + timing.seconds(begin) if begin else parent)
+                continue
+
+            start = offsets.pop()
+
+            if name != "p":
+                continue
+
+            parent = offsets[-1] if offsets else 0.0
+            end, dur = elem.get("end"), elem.get("dur")
+            if end:
+                end = parent + timing.seconds(end)
+            elif dur:
+                end = start + timing.seconds(dur)
+
+            text = _text(elem)
+            if end is not None and text:
+                yield start, end, text
+
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    parser.close()
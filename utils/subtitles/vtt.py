@@ -0,0 +1,66 @@
+"""
+Streaming WebVTT/SRT parser
+
+Both formats share the same cue layout, only the decimal separator differs,
+so one line-based parser handles either
+"""
+
+import codecs
+import html
+import re
+
+TIMING = re.compile(
+    r"^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})"
+)
+# Keep the tags SRT players understand, drop voice/class spans and karaoke timestamps
+TAGS = re.compile(r"<(?!/?[ibu]>)[^>]*>")
+# <i.loud> keeps its italics as plain <i> so its closing tag stays balanced
+CLASSES = re.compile(r"<([ibu])\.[^>]*>")
+
+
+def seconds(value: str) -> float:
+    parts = value.replace(",", ".").split(":")
+    total = float(parts.pop())
+    for multiplier, part in zip((60, 3600), reversed(parts)):
+        total += int(part) * multiplier
+    return total
+
+
+def lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        yield from complete
+
+    pending += decoder.decode(b"", final=True)
+    yield from pending.split("\n")
+
+
+def vtt_cues(chunks):
+    """Yield (start, end, text) cues, in seconds, from an iterable of VTT or SRT bytes"""
+    timing = None
+    text = []
+
+    for line in lines(chunks):
+        line = line.rstrip("\r")
+
+        if timing is None:
+            match = TIMING.match(line)
+            if match:
+                timing = seconds(match.group(1)), seconds(match.group(2))
+            continue
+
+        if line.strip():
+            line = TAGS.sub("", CLASSES.sub(r"<\1>", line))
+            text.append(html.unescape(line).strip())
+            continue
+
+        if any(text):
+            yield timing[0], timing[1], "\n".join(x for x in text if x)
+        timing, text = None, []
+
+    if timing is not None and any(text):
+        yield timing[0], timing[1], "\n".join(x for x in text if x)
@@ -1,12 +1,59 @@
 import re
+import sys
 
+from functools import lru_cache
 from sortedcontainers import SortedKeyList
 from abc import ABC
 
 from utils.utilities import string_cleaning
 
 
+EPISODE_NAME = re.compile(r"Episode ?#?\d+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def _label(season: int, number: int) -> str:
+    """S01E02, S01, E02 or "", one shared string per (season, number)"""
+    season, number = season or 0, number or 0
+    if season == 0 and number == 0:
+        return ""
+    if season == 0 and number > 0:
+        return f"E{number:02}"
+    if number == 0 and season > 0:
+        return f"S{season:02}"
+    return f"S{season:02}E{number:02}"
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _resolve(value, record):
+    """
+    Descriptions may be passed as a callable that takes the record and is only
+    run on first access. One loader can serve a whole catalog, so records that
+    are never shown cost nothing for their text
+    """
+    return value(record) if callable(value) else value
+
+
 class Episode:
+    __slots__ = (
+        "id",
+        "service",
+        "title",
+        "season",
+        "number",
+        "name",
+        "year",
+        "data",
+        "subtitle",
+        "lic_url",
+        "_synopsis",
+        "_description",
+        "special",
+    )
+
     def __init__(
         self,
         id_=None,
@@ -27,12 +74,12 @@ class Episode:
             name = name.strip()
             if name.lower() == title.lower():
                 name = ""
-            if re.match(r"Episode ?#?\d+", name, re.IGNORECASE):
+            if EPISODE_NAME.match(name):
                 name = ""
 
         self.id = id_
-        self.service = service
-        self.title = title
+        self.service = _intern(service)
+        self.title = _intern(title)
         self.season = season
         self.number = number
         self.name = name
@@ -40,33 +87,53 @@ class Episode:
         self.data = data
         self.subtitle = subtitle
         self.lic_url = lic_url
-        self.synopsis = synopsis
-        self.description = description
+        self._synopsis = synopsis
+        self._description = description
         self.special = special
 
+    @property
+    def synopsis(self):
+        self._synopsis = _resolve(self._synopsis, self)
+        return self._synopsis
+
+    @synopsis.setter
+    def synopsis(self, value):
+        self._synopsis = value
+
+    @property
+    def description(self):
+        self._description = _resolve(self._description, self)
+        return self._description
+
+    @description.setter
+    def description(self, value):
+        self._description = value
+
+    @property
+    def label(self) -> str:
+        return _label(self.season, self.number)
+
+    @property
+    def key(self) -> str:
+        """Lowercase search key; Series.keys() keeps these for a whole catalog"""
+        return str(self).lower()
+
     def __str__(self) -> str:
-        if self.season == 0 and self.number == 0:
-            return "{title} {name}".format(title=self.title, name=self.name).strip()
-        
-        elif self.season == 0 and self.number > 0:
-            return "{title} E{number:02} {name}".format(
-                title=self.title, 
-                number=self.number, 
-                name=self.name).strip()
-        
-        elif self.number == 0 and self.season > 0:
-            return "{title} S{season:02} {name}".format(
-                title=self.title, 
-                season=self.season, 
-                name=self.name).strip()
-    
-        else:
-            return "{title} S{season:02}E{number:02} {name}".format(
-                title=self.title,
-                season=self.season,
-                number=self.number,
-                name=self.name or "",
-            ).strip()
+        return " ".join(x for x in (self.title, self.label, self.name) if x).strip()
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "episode",
+            "id": self.id,
+            "service": self.service,
+            "title": self.title,
+            "season": self.season,
+            "number": self.number,
+            "name": self.name,
+            "year": self.year,
+            "label": str(self),
+            "description": self.description,
+        }
 
     def get_filename(self) -> str:
         name = "{title} S{season:02}E{number:02} {name}".format(
@@ -81,8 +148,68 @@ class Episode:
 
 class Series(SortedKeyList, ABC):
     def __init__(self, iterable=None):
+        self._changed()
         super().__init__(iterable, key=lambda x: (x.season, x.number, x.year or 0))
 
+    def _changed(self):
+        self._lookup = None
+        self._search_keys = None
+
+    def add(self, value):
+        self._changed()
+        super().add(value)
+
+    def update(self, iterable):
+        self._changed()
+        super().update(iterable)
+
+    def clear(self):
+        self._changed()
+        super().clear()
+
+    def discard(self, value):
+        self._changed()
+        super().discard(value)
+
+    def remove(self, value):
+        self._changed()
+        super().remove(value)
+
+    def pop(self, index=-1):
+        self._changed()
+        return super().pop(index)
+
+    def __delitem__(self, index):
+        self._changed()
+        super().__delitem__(index)
+
+    def keys(self) -> list:
+        """Search key of every episode, in order, built on first use"""
+        if self._search_keys is None:
+            self._search_keys = [episode.key for episode in self]
+        return self._search_keys
+
+    def get(self, season: int, number: int):
+        """Episode by (season, number), or None"""
+        if self._lookup is None:
+            self._lookup = {}
+            for episode in self:
+                self._lookup.setdefault((episode.season, episode.number), episode)
+
+        return self._lookup.get((season, number))
+
+    def get_season(self, season: int) -> list:
+        """Episodes are sorted by season, so every season is one contiguous slice"""
+        start = self.bisect_key_left((season,))
+        stop = self.bisect_key_left((season + 1,))
+        return self[start:stop]
+
+    def get_range(self, start: tuple, end: tuple) -> list:
+        """Episodes from (season, number) up to and including (season, number)"""
+        first = self.bisect_key_left(start)
+        last = self.bisect_key_left((end[0], end[1] + 1))
+        return self[first:last]
+
     def __str__(self) -> str:
         if not self:
             return super().__str__()
@@ -90,6 +217,18 @@ class Series(SortedKeyList, ABC):
 
 
 class Movie:
+    __slots__ = (
+        "id",
+        "service",
+        "title",
+        "name",
+        "year",
+        "data",
+        "subtitle",
+        "lic_url",
+        "_synopsis",
+    )
+
     def __init__(
         self,
         id_=None,
@@ -106,21 +245,41 @@ class Movie:
             name = name.strip()
 
         self.id = id_
-        self.service = service
-        self.title = title
+        self.service = _intern(service)
+        self.title = _intern(title)
         self.name = name
         self.year = year
         self.data = data
         self.subtitle = subtitle
         self.lic_url = lic_url
-        self.synopsis = synopsis
+        self._synopsis = synopsis
 
+    @property
+    def synopsis(self):
+        self._synopsis = _resolve(self._synopsis, self)
+        return self._synopsis
+
+    @synopsis.setter
+    def synopsis(self, value):
+        self._synopsis = value
 
     def __str__(self) -> str:
         if self.year:
             return f"{self.name} ({self.year})"
         return self.name
 
+    def to_dict(self) -> dict:
+        return {
+            "type": "movie",
+            "id": self.id,
+            "service": self.service,
+            "title": self.title,
+            "name": self.name,
+            "year": self.year,
+            "label": str(self),
+            "synopsis": self.synopsis,
+        }
+
     def get_filename(self) -> str:
         name = str(self).replace("$", "S")
 
@@ -1,6 +1,5 @@
 import re
 import datetime
-import shutil
 
 from pathlib import Path
 
@@ -10,13 +9,23 @@ from rich.panel import Panel
 from rich.style import Style
 from rich.padding import Padding
 
+from utils.output import write_records
+
+_log_to_stderr = False
+
+
+def log_to_stderr(enabled: bool = True) -> None:
+    """Keep stdout clean for machine-readable output"""
+    global _log_to_stderr
+    _log_to_stderr = enabled
+
 
 def info(text: str) -> str:
     time = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
     stamp = click.style(f"{time}")
     info = click.style(f"INFO", fg="green", underline=True)
     message = click.style(f" : {text}")
-    return click.echo(f"{stamp} {info}{message}")
+    return click.echo(f"{stamp} {info}{message}", err=_log_to_stderr)
 
 
 def error(text: str) -> str:
@@ -24,7 +33,7 @@ def error(text: str) -> str:
     stamp = click.style(f"{time}")
     info = click.style(f"ERROR", fg="red", underline=True)
     message = click.style(f" : {text}")
-    return click.echo(f"{stamp} {info}{message}")
+    return click.echo(f"{stamp} {info}{message}", err=_log_to_stderr)
 
 
 def string_cleaning(filename: str) -> str:
@@ -37,21 +46,35 @@ def string_cleaning(filename: str) -> str:
     return filename
 
 
-def set_range(episode: str) -> list:
-    start, end = episode.split("-")
-    start_season, start_episode = start.split("E")
-    end_season, end_episode = end.split("E")
+EPISODE_SELECTOR = re.compile(r"^S(\d+)(?:E(\d+))?$", re.IGNORECASE)
+SEASON_SELECTOR = re.compile(r"^S?(\d+)$", re.IGNORECASE)
 
-    start_season = int(start_season[1:])
-    start_episode = int(start_episode)
-    end_season = int(end_season[1:])
-    end_episode = int(end_episode)
 
-    return [
-        f"S{season:02d}E{episode:02d}"
-        for season in range(start_season, end_season + 1)
-        for episode in range(start_episode, end_episode + 1)
-    ]
+def parse_episode(selector: str) -> tuple:
+    """S01E02 -> (1, 2), S01 -> (1, None), anything else -> None"""
+    match = EPISODE_SELECTOR.match(selector.strip())
+    if not match:
+        return None
+
+    season, number = match.groups()
+    return int(season), int(number) if number is not None else None
+
+
+def parse_season(selector: str) -> int:
+    """S01 or 1 -> 1, anything else -> None"""
+    match = SEASON_SELECTOR.match(selector.strip())
+    return int(match.group(1)) if match else None
+
+
+def parse_range(selector: str) -> tuple:
+    """S01E01-S01E10 -> ((1, 1), (1, 10)), anything else -> None"""
+    start, _, end = selector.partition("-")
+    start, end = parse_episode(start), parse_episode(end)
+
+    if start is None or end is None or None in start or None in end:
+        return None
+
+    return start, end
 
 
 def set_filename(service: object, stream: object, res: str, audio: str):
@@ -89,28 +112,6 @@ def set_filename(service: object, stream: object, res: str, audio: str):
     return filename.replace(" ", ".") if filename.count(".") >= 2 else filename
 
 
-def add_subtitles(soup: object, subtitle: str) -> object:
-    adaptation_set = soup.new_tag(
-        "AdaptationSet",
-        id="3",
-        group="3",
-        contentType="text",
-        mimeType="text/vtt",
-        startWithSAP="1",
-    )
-    representation = soup.new_tag("Representation", id="English", bandwidth="0")
-    base_url = soup.new_tag("BaseURL")
-    base_url.string = f"{subtitle}"
-
-    adaptation_set.append(representation)
-    representation.append(base_url)
-
-    period = soup.find("Period")
-    period.append(adaptation_set)
-
-    return soup
-
-
 def set_save_path(stream: object, config, title: str) -> Path:
     downloads = (
         Path(config["save_dir"]["movies"])
@@ -158,6 +159,21 @@ def print_info(service: object, stream: object, keys: list):
         or "audio" in x.attrs.get("id")
     ]
 
+    if service.output:
+        record = stream.to_dict()
+        record["video"] = [
+            {"width": width, "height": height, "bandwidth": bandwidth}
+            for width, height, bandwidth in video
+        ]
+        record["audio"] = [
+            {"id": id, "bandwidth": int(bandwidth), "codecs": codec}
+            for bandwidth, id, codec in audio
+        ]
+        record["keys"] = keys
+        write_records([record], service.output)
+
+        exit(0)
+
     text = (
         f"{stream.description}\n\n"
         if stream.__class__.__name__ == "Episode"
@@ -184,5 +200,4 @@ def print_info(service: object, stream: object, keys: list):
     panel = Panel(padding, title=title, width=80, style=Style(color="bright_black"))
     console.print(panel)
 
-    shutil.rmtree(service.tmp)
     exit(0)
@@ -0,0 +1,57 @@
+"""
+Per-run temp workspaces
+
+Keys, manifests and subtitles go to a private directory made with tempfile,
+so runs started from the same folder can't overwrite each other's files.
+Everything is removed by cleanup() when freevine exits, with an atexit hook
+as a fallback for other entry points
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+from pathlib import Path
+
+TMPFS = Path("/dev/shm")
+
+_workspaces = []
+_lock = threading.Lock()
+
+
+def _tmpfs() -> Path:
+    if TMPFS.is_dir() and os.access(TMPFS, os.W_OK):
+        return TMPFS
+    return None
+
+
+def create(config: dict = None) -> Path:
+    """
+    New workspace directory for a job
+
+    With tmpfs set to "true" in config.yaml, small artifacts are kept in
+    /dev/shm when it's available
+    """
+    config = config or {}
+    memory = str(config.get("tmpfs", "false")).lower() == "true"
+    parent = _tmpfs() if memory else None
+
+    path = Path(tempfile.mkdtemp(prefix="freevine-", dir=parent))
+    with _lock:
+        _workspaces.append(path)
+    return path
+
+
+def cleanup() -> None:
+    """Remove every workspace created by this process"""
+    with _lock:
+        paths = _workspaces[:]
+        _workspaces.clear()
+
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+atexit.register(cleanup)